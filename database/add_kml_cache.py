@@ -50,10 +50,10 @@ def add_kml_cache_table(database_path: str, verbose: bool = False) -> bool:
             CREATE TABLE kml_cache (
                 pk INTEGER PRIMARY KEY AUTOINCREMENT,
                 volume_ref INTEGER NOT NULL,
-                kml_content TEXT NOT NULL,
+                kml_content BLOB NOT NULL,
+                compression TEXT,
                 generated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                 content_hash TEXT NOT NULL,
-                file_size INTEGER,
                 FOREIGN KEY (volume_ref) REFERENCES volumes(pk),
                 UNIQUE(volume_ref)
             )
@@ -118,11 +118,11 @@ def show_cache_stats(database_path: str) -> bool:
         cursor.execute("SELECT COUNT(*) FROM kml_cache")
         total_entries = cursor.fetchone()[0]
         
-        cursor.execute("SELECT SUM(file_size) FROM kml_cache")
-        total_size = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT AVG(file_size) FROM kml_cache")
-        avg_size = cursor.fetchone()[0] or 0
+        # Tailles stockées (compressées), calculées plutôt que dupliquées dans une colonne
+        cursor.execute("SELECT SUM(length(kml_content)), AVG(length(kml_content)) FROM kml_cache")
+        total_size, avg_size = cursor.fetchone()
+        total_size = total_size or 0
+        avg_size = avg_size or 0
         
         cursor.execute("""
             SELECT MIN(generated_at), MAX(generated_at) 
@@ -141,10 +141,10 @@ def show_cache_stats(database_path: str) -> bool:
         
         # Top 5 des plus gros KML
         cursor.execute("""
-            SELECT kc.volume_ref, kc.file_size, v.lk, kc.generated_at
+            SELECT kc.volume_ref, length(kc.kml_content) AS taille, v.lk, kc.generated_at
             FROM kml_cache kc
             JOIN volumes v ON kc.volume_ref = v.pk
-            ORDER BY kc.file_size DESC
+            ORDER BY taille DESC
             LIMIT 5
         """)
         
@@ -10,11 +10,202 @@ Usage:
 
 import xml.etree.ElementTree as ET
 import argparse
+import copy
+import io
+import logging
 import sys
 import os
 import re
+import sqlite3
+from collections import defaultdict
 from typing import Set, Dict, List, Optional, Tuple
-from xml.dom import minidom
+
+# Détail de l'extraction entité par entité (niveau DEBUG, formatage différé)
+logger = logging.getLogger(__name__)
+
+# Sections XML-SIA lues par l'extracteur (les autres sont ignorées au chargement)
+SECTION_TAGS = frozenset({
+    'TerritoireS', 'AdS', 'EspaceS', 'PartieS', 'VolumeS', 'ServiceS', 'FrequenceS'
+})
+
+# Sections du XML de sortie, dans l'ordre du schéma : (collection extraite, section)
+OUTPUT_SECTIONS = (
+    ('territoires', 'TerritoireS'),
+    ('ads', 'AdS'),
+    ('espaces', 'EspaceS'),
+    ('parties', 'PartieS'),
+    ('volumes', 'VolumeS'),
+    ('services', 'ServiceS'),
+    ('frequences', 'FrequenceS'),
+)
+
+# Colonnes des tables SQLite (utils/schema_generator.py, hors colonnes générées) et
+# leur source XML : '@attr' attribut de l'entité, 'Tag' texte de l'enfant,
+# 'Tag@attr' attribut de l'enfant (références)
+COLUMNS = {
+    'territoires': (
+        ('pk', '@pk'), ('lk', '@lk'), ('territoire', 'Territoire'), ('nom', 'Nom'),
+    ),
+    'aerodromes': (
+        ('pk', '@pk'), ('lk', '@lk'), ('territoire_ref', 'Territoire@pk'),
+        ('ad_code', 'AdCode'), ('ad_ad2', 'AdAd2'), ('ad_statut', 'AdStatut'),
+        ('ad_nom_complet', 'AdNomComplet'), ('ad_nom_carto', 'AdNomCarto'),
+        ('ad_situation', 'AdSituation'), ('wgs84', 'Wgs84'), ('arp_lat', 'ArpLat'),
+        ('arp_long', 'ArpLong'), ('arp_situation', 'ArpSituation'),
+        ('ad_ref_alt_ft', 'AdRefAltFt'), ('ad_geo_und', 'AdGeoUnd'), ('ad_ref_temp', 'AdRefTemp'),
+        ('ad_mag_var', 'AdMagVar'), ('mag_var_date', 'MagVarDate'),
+        ('tfc_intl', 'TfcIntl'), ('tfc_ntl', 'TfcNtl'), ('tfc_ifr', 'TfcIfr'), ('tfc_vfr', 'TfcVfr'),
+        ('tfc_regulier', 'TfcRegulier'), ('tfc_non_regulier', 'TfcNonRegulier'),
+        ('tfc_prive', 'TfcPrive'), ('ad_gestion', 'AdGestion'), ('ad_adresse', 'AdAdresse'),
+        ('ad_tel', 'AdTel'), ('ad_afs', 'AdAfs'), ('ad_rem', 'AdRem'),
+        ('geometrie', 'Geometrie'), ('extension', 'Extension'),
+        ('hor_cust_code', 'HorCustCode'), ('hor_ats_code', 'HorAtsCode'),
+        ('hor_met_txt', 'HorMetTxt'), ('hor_rem', 'HorRem'),
+        ('hor_cust_txt', 'HorCustTxt'), ('hor_ats_txt', 'HorAtsTxt'),
+        ('ctr_pk', 'Ctr@pk'), ('ctr_lk', 'Ctr@lk'),
+    ),
+    'espaces': (
+        ('pk', '@pk'), ('lk', '@lk'), ('territoire_ref', 'Territoire@pk'),
+        ('type_espace', 'TypeEspace'), ('nom', 'Nom'), ('altr_ft', 'AltrFt'),
+        ('ad_associe_ref', 'AdAssocie@pk'),
+    ),
+    'parties': (
+        ('pk', '@pk'), ('lk', '@lk'), ('espace_ref', 'Espace@pk'), ('nom_partie', 'NomPartie'),
+        ('numero_partie', 'NumeroPartie'), ('contour', 'Contour'), ('geometrie', 'Geometrie'),
+        ('extension', 'Extension'),
+    ),
+    'volumes': (
+        ('pk', '@pk'), ('lk', '@lk'), ('partie_ref', 'Partie@pk'), ('sequence', 'Sequence'),
+        ('plafond_ref_unite', 'PlafondRefUnite'), ('plafond', 'Plafond'),
+        ('plancher_ref_unite', 'PlancherRefUnite'), ('plancher', 'Plancher'),
+        ('classe', 'Classe'), ('hor_code', 'HorCode'), ('hor_txt', 'HorTxt'),
+    ),
+    'services': (
+        ('pk', '@pk'), ('lk', '@lk'), ('ad_ref', 'Ad@pk'), ('espace_ref', 'Espace@pk'),
+        ('service', 'Service'), ('indic_lieu', 'IndicLieu'), ('indic_service', 'IndicService'),
+        ('langue', 'Langue'),
+    ),
+    'frequences': (
+        ('pk', '@pk'), ('lk', '@lk'), ('service_ref', 'Service@pk'), ('frequence', 'Frequence'),
+        ('hor_code', 'HorCode'), ('secteur_situation', 'SecteurSituation'),
+        ('remarque', 'Remarque'),
+    ),
+}
+
+# Table SQLite de chaque collection extraite, dans l'ordre des dépendances
+TABLES = (
+    ('territoires', 'territoires'),
+    ('ads', 'aerodromes'),
+    ('espaces', 'espaces'),
+    ('parties', 'parties'),
+    ('volumes', 'volumes'),
+    ('services', 'services'),
+    ('frequences', 'frequences'),
+)
+
+# Index pk -> élément : (clé d'index, section, entité)
+PK_INDEXES = (
+    ('territoires_by_pk', 'TerritoireS', 'Territoire'),
+    ('ads_by_pk', 'AdS', 'Ad'),
+)
+
+# Index inverses pk référencé -> [éléments] : (clé d'index, section, entité, référence)
+REF_INDEXES = (
+    ('parties_by_espace', 'PartieS', 'Partie', 'Espace'),
+    ('volumes_by_partie', 'VolumeS', 'Volume', 'Partie'),
+    ('services_by_ad', 'ServiceS', 'Service', 'Ad'),
+    ('services_by_espace', 'ServiceS', 'Service', 'Espace'),
+    ('frequences_by_service', 'FrequenceS', 'Frequence', 'Service'),
+)
+
+def _indent_fallback(elem: ET.Element, space: str = "  ", level: int = 0) -> None:
+    """Indentation en place des descendants (équivalent de ET.indent pour Python < 3.9)"""
+    if not len(elem):
+        return
+    indentation = "\n" + level * space
+    if not elem.text or not elem.text.strip():
+        elem.text = indentation + space
+    for child in elem:
+        _indent_fallback(child, space, level + 1)
+        if not child.tail or not child.tail.strip():
+            child.tail = indentation + space
+    if not child.tail.strip():
+        child.tail = indentation
+
+# ET.indent n'existe qu'à partir de Python 3.9
+_indent = getattr(ET, 'indent', _indent_fallback)
+
+def _column_getters(sources: Tuple[Tuple[str, str], ...]) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Décompose les sources de COLUMNS en (balise enfant, attribut), une fois pour toutes"""
+    getters = []
+    for _, source in sources:
+        tag, _, attr = source.partition('@')
+        getters.append((tag or None, attr or None))
+    return getters
+
+_COLUMN_GETTERS = {table: _column_getters(sources) for table, sources in COLUMNS.items()}
+
+class _StdoutHandler(logging.StreamHandler):
+    """Journalisation sur la sortie standard, sans vidage du tampon à chaque message"""
+    
+    def flush(self):
+        # Sortie vidée par Python en fin de programme (ou à chaque ligne sur un terminal)
+        pass
+
+class _SiaTarget:
+    """
+    Cible du parseur expat ne construisant que les sections utiles à l'extraction
+    
+    Les sections de premier niveau (sous SiaExport ou sous Situation) absentes de
+    SECTION_TAGS sont ignorées dès leur balise ouvrante : aucun de leurs éléments
+    n'est créé. Le reste de l'arbre est délégué au TreeBuilder (en C).
+    """
+    
+    def __init__(self):
+        self._builder = ET.TreeBuilder()
+        self._depth = 0
+        self._skip_depth = 0          # > 0 : à l'intérieur d'une section ignorée
+        self._in_situation = False
+        self.sections = {}            # balise -> élément de section
+        self.namespaces = {}          # préfixe -> URI (Python 3.8+)
+    
+    def _is_section_level(self) -> bool:
+        return self._depth == 2 or (self._depth == 3 and self._in_situation)
+    
+    def start(self, tag: str, attrib: Dict[str, str]) -> None:
+        self._depth += 1
+        if self._skip_depth:
+            self._skip_depth += 1
+            return
+        if self._depth == 2:
+            self._in_situation = tag == 'Situation'
+            if self._in_situation:
+                self._builder.start(tag, attrib)
+                return
+        if self._is_section_level() and tag not in SECTION_TAGS:
+            self._skip_depth = 1
+            return
+        self._builder.start(tag, attrib)
+    
+    def end(self, tag: str) -> None:
+        if self._skip_depth:
+            self._skip_depth -= 1
+        else:
+            elem = self._builder.end(tag)
+            if self._is_section_level() and tag in SECTION_TAGS:
+                self.sections[tag] = elem
+        self._depth -= 1
+    
+    def data(self, data: str) -> None:
+        if not self._skip_depth:
+            self._builder.data(data)
+    
+    def start_ns(self, prefix: str, uri: str) -> None:
+        # Déclarations xmlns (absentes de attrib avec ElementTree)
+        self.namespaces[prefix] = uri
+    
+    def close(self) -> ET.Element:
+        return self._builder.close()
 
 def normalize_filename(lk_identifier: str) -> str:
     """
@@ -84,17 +275,41 @@ class XsdBasedEspaceExtractor:
             'bordure_refs': set()
         }
         
+        # Sections de premier niveau (balise -> élément) et index, construits une fois
+        # par load_xml et conservés par reset_extracted
+        self._sections = {}
+        self._index = {}
+        
+    def reset_extracted(self) -> None:
+        """
+        Vide les entités extraites et les références à résoudre
+        
+        L'arbre chargé et ses index sont conservés : plusieurs espaces peuvent être
+        extraits successivement sans relire le fichier XML.
+        """
+        self.target_espace_lk = None
+        for collection in self.extracted.values():
+            collection.clear()
+        for references in self.references_to_resolve.values():
+            references.clear()
+    
     def load_xml(self) -> bool:
-        """Charge le fichier XML SIA"""
+        """
+        Charge le fichier XML SIA en ne construisant que les sections utilisées
+        
+        Les autres collections (RunwayS, NavFixS, ...) sont ignorées par la cible du
+        parseur (_SiaTarget) sans qu'aucun de leurs éléments ne soit créé, ce qui
+        limite le temps et la mémoire sur les exports SIA complets.
+        
+        Returns:
+            True si le chargement a réussi
+        """
         try:
-            tree = ET.parse(self.xml_file)
-            self.root = tree.getroot()
-            
-            # Détection des namespaces
-            for key, value in self.root.attrib.items():
-                if key.startswith('xmlns'):
-                    prefix = key[6:] if ':' in key else ''
-                    self.namespaces[prefix] = value
+            target = _SiaTarget()
+            self.root = ET.parse(self.xml_file, parser=ET.XMLParser(target=target)).getroot()
+            self._sections = target.sections
+            self.namespaces.update(target.namespaces)
+            self._build_index()
                     
             print(f"✓ Fichier XML SIA chargé: {self.xml_file}")
             print(f"✓ Namespaces détectés: {self.namespaces}")
@@ -107,25 +322,68 @@ class XsdBasedEspaceExtractor:
             print(f"✗ Fichier non trouvé: {self.xml_file}")
             return False
     
+    def _build_index(self) -> None:
+        """
+        Indexe les sections chargées en un seul parcours
+        
+        Chaque extraction résout ensuite ses références par accès direct au lieu de
+        reparcourir les sections complètes (pk -> élément, et index inverses
+        espace -> parties, partie -> volumes, ad -> services, service -> fréquences).
+        """
+        self._index = {}
+        sections = self._sections
+        
+        espaces_by_pk = {}
+        espaces_by_lk = {}
+        espaces_section = sections.get('EspaceS')
+        if espaces_section is not None:
+            for espace in espaces_section.findall('Espace'):
+                # Premier espace rencontré prioritaire, comme la recherche séquentielle
+                espaces_by_pk.setdefault(espace.get('pk'), espace)
+                lk = espace.get('lk')
+                if lk is not None:
+                    espaces_by_lk.setdefault(lk, espace)
+        self._index['espaces_by_pk'] = espaces_by_pk
+        self._index['espaces_by_lk'] = espaces_by_lk
+        
+        for key, section_tag, tag in PK_INDEXES:
+            by_pk = {}
+            section = sections.get(section_tag)
+            if section is not None:
+                for elem in section.findall(tag):
+                    by_pk[elem.get('pk')] = elem
+            self._index[key] = by_pk
+        
+        for key, section_tag, tag, ref_tag in REF_INDEXES:
+            by_ref = defaultdict(list)
+            section = sections.get(section_tag)
+            if section is not None:
+                for elem in section.findall(tag):
+                    ref = elem.find(ref_tag)
+                    if ref is not None:
+                        by_ref[ref.get('pk')].append(elem)
+            self._index[key] = by_ref
+    
     def find_espace_by_identifier(self, identifier: str) -> Optional[ET.Element]:
         """Trouve un espace par pk ou lk selon le schéma XSD"""
         
         # Recherche dans la section EspaceS
-        espaces_section = self.root.find('.//EspaceS')
+        espaces_section = self._sections.get('EspaceS')
         if espaces_section is None:
             print("✗ Section EspaceS non trouvée dans le XML")
             return None
             
-        for espace in espaces_section.findall('Espace'):
-            # Recherche par pk (attribut système obligatoire selon XSD)
-            if espace.get('pk') == identifier:
-                print(f"✓ Espace trouvé par pk: {identifier}")
-                return espace
-                
-            # Recherche par lk (attribut système optionnel selon XSD)  
-            if espace.get('lk') == identifier:
-                print(f"✓ Espace trouvé par lk: {identifier}")
-                return espace
+        # Recherche par pk (attribut système obligatoire selon XSD)
+        espace = self._index['espaces_by_pk'].get(identifier)
+        if espace is not None:
+            print(f"✓ Espace trouvé par pk: {identifier}")
+            return espace
+            
+        # Recherche par lk (attribut système optionnel selon XSD)  
+        espace = self._index['espaces_by_lk'].get(identifier)
+        if espace is not None:
+            print(f"✓ Espace trouvé par lk: {identifier}")
+            return espace
         
         print(f"✗ Espace non trouvé: {identifier}")
         return None
@@ -164,35 +422,35 @@ class XsdBasedEspaceExtractor:
         if territoire_ref is not None:
             territoire_pk = territoire_ref.get('pk')
             self.references_to_resolve['territoire_refs'].add(territoire_pk)
-            print(f"  → Territoire référencé: pk={territoire_pk}")
+            logger.debug("  → Territoire référencé: pk=%s", territoire_pk)
         
         # 3b. AdAssocieRef (optionnel selon XSD)
         ad_associe = espace.find('AdAssocie')
         if ad_associe is not None:
             ad_pk = ad_associe.get('pk')
             self.references_to_resolve['ad_refs'].add(ad_pk)
-            print(f"  → Aérodrome associé: pk={ad_pk}")
+            logger.debug("  → Aérodrome associé: pk=%s", ad_pk)
             
         # 3c. Parties intégrées dans l'espace (selon XSD)
         parties = espace.findall('Partie')
         for partie in parties:
             partie_pk = partie.get('pk')
             self.extracted['parties'][partie_pk] = partie
-            print(f"  → Partie intégrée: pk={partie_pk}")
+            logger.debug("  → Partie intégrée: pk=%s", partie_pk)
             
             # 3d. Volumes des parties
             volumes = partie.findall('Volume')
             for volume in volumes:
                 volume_pk = volume.get('pk')
                 self.extracted['volumes'][volume_pk] = volume
-                print(f"    → Volume: pk={volume_pk}")
+                logger.debug("    → Volume: pk=%s", volume_pk)
         
         # 3e. Services intégrés dans l'espace (selon XSD)
         services = espace.findall('Service')
         for service in services:
             service_pk = service.get('pk')
             self.extracted['services'][service_pk] = service
-            print(f"  → Service intégré: pk={service_pk}")
+            logger.debug("  → Service intégré: pk=%s", service_pk)
         
         # 4. Rechercher les entités liées dans les sections principales du XML
         self._resolve_external_references(espace_pk)
@@ -203,153 +461,188 @@ class XsdBasedEspaceExtractor:
         """Résout toutes les références externes selon les relations XSD"""
         
         # Résolution des Territoires
-        if self.references_to_resolve['territoire_refs']:
-            territoires_section = self.root.find('.//TerritoireS')
-            if territoires_section is not None:
-                for territoire in territoires_section.findall('Territoire'):
-                    pk = territoire.get('pk')
-                    if pk in self.references_to_resolve['territoire_refs']:
-                        self.extracted['territoires'][pk] = territoire
-                        print(f"  ✓ Territoire résolu: pk={pk}")
+        territoires_by_pk = self._index['territoires_by_pk']
+        for pk in self.references_to_resolve['territoire_refs']:
+            territoire = territoires_by_pk.get(pk)
+            if territoire is not None:
+                self.extracted['territoires'][pk] = territoire
+                logger.debug("  ✓ Territoire résolu: pk=%s", pk)
         
         # Résolution des Aérodromes
-        if self.references_to_resolve['ad_refs']:
-            ads_section = self.root.find('.//AdS')
-            if ads_section is not None:
-                for ad in ads_section.findall('Ad'):
-                    pk = ad.get('pk')
-                    if pk in self.references_to_resolve['ad_refs']:
-                        self.extracted['ads'][pk] = ad
-                        print(f"  ✓ Aérodrome résolu: pk={pk}")
+        ads_by_pk = self._index['ads_by_pk']
+        for pk in self.references_to_resolve['ad_refs']:
+            ad = ads_by_pk.get(pk)
+            if ad is not None:
+                self.extracted['ads'][pk] = ad
+                logger.debug("  ✓ Aérodrome résolu: pk=%s", pk)
         
         # Recherche des Parties externes (référençant cet espace)
-        parties_section = self.root.find('.//PartieS')
-        if parties_section is not None:
-            for partie in parties_section.findall('Partie'):
-                espace_ref = partie.find('Espace')
-                if espace_ref is not None and espace_ref.get('pk') == espace_pk:
-                    partie_pk = partie.get('pk')
-                    self.extracted['parties'][partie_pk] = partie
-                    print(f"  ✓ Partie externe trouvée: pk={partie_pk}")
-                    
-                    # Volumes de cette partie
-                    volumes = partie.findall('Volume')
-                    for volume in volumes:
-                        volume_pk = volume.get('pk')
-                        self.extracted['volumes'][volume_pk] = volume
-                        print(f"    ✓ Volume de partie: pk={volume_pk}")
+        for partie in self._index['parties_by_espace'].get(espace_pk, ()):
+            partie_pk = partie.get('pk')
+            self.extracted['parties'][partie_pk] = partie
+            logger.debug("  ✓ Partie externe trouvée: pk=%s", partie_pk)
+            
+            # Volumes de cette partie
+            volumes = partie.findall('Volume')
+            for volume in volumes:
+                volume_pk = volume.get('pk')
+                self.extracted['volumes'][volume_pk] = volume
+                logger.debug("    ✓ Volume de partie: pk=%s", volume_pk)
         
         # Recherche des Volumes externes (référençant les parties)
-        volumes_section = self.root.find('.//VolumeS')
-        if volumes_section is not None:
-            for volume in volumes_section.findall('Volume'):
-                partie_ref = volume.find('Partie')
-                if partie_ref is not None:
-                    partie_pk = partie_ref.get('pk')
-                    if partie_pk in self.extracted['parties']:
-                        volume_pk = volume.get('pk')
-                        if volume_pk not in self.extracted['volumes']:
-                            self.extracted['volumes'][volume_pk] = volume
-                            print(f"    ✓ Volume externe trouvé: pk={volume_pk}")
-        
-        # Recherche des Services externes
-        services_section = self.root.find('.//ServiceS')
-        if services_section is not None:
-            for service in services_section.findall('Service'):
-                # Services liés à l'aérodrome associé
-                for ad_pk in self.references_to_resolve['ad_refs']:
-                    ad_ref = service.find('Ad')
-                    if ad_ref is not None and ad_ref.get('pk') == ad_pk:
-                        service_pk = service.get('pk')
-                        self.extracted['services'][service_pk] = service
-                        print(f"  ✓ Service résolu: pk={service_pk}")
+        volumes_by_partie = self._index['volumes_by_partie']
+        for partie_pk in self.extracted['parties']:
+            for volume in volumes_by_partie.get(partie_pk, ()):
+                volume_pk = volume.get('pk')
+                if volume_pk not in self.extracted['volumes']:
+                    self.extracted['volumes'][volume_pk] = volume
+                    logger.debug("    ✓ Volume externe trouvé: pk=%s", volume_pk)
+        
+        # Recherche des Services externes : liés à l'aérodrome associé, ou à l'espace
+        services = self.extracted['services']
+        services_by_ad = self._index['services_by_ad']
+        for ad_pk in self.references_to_resolve['ad_refs']:
+            for service in services_by_ad.get(ad_pk, ()):
+                service_pk = service.get('pk')
+                services[service_pk] = service
+                logger.debug("  ✓ Service résolu: pk=%s", service_pk)
+        for service in self._index['services_by_espace'].get(espace_pk, ()):
+            service_pk = service.get('pk')
+            services[service_pk] = service
+            logger.debug("  ✓ Service de l'espace résolu: pk=%s", service_pk)
         
         # Recherche des Fréquences des services
-        frequences_section = self.root.find('.//FrequenceS')
-        if frequences_section is not None:
-            for frequence in frequences_section.findall('Frequence'):
-                service_ref = frequence.find('Service')
-                if service_ref is not None:
-                    service_pk = service_ref.get('pk')
-                    if service_pk in self.extracted['services']:
-                        frequence_pk = frequence.get('pk')
-                        self.extracted['frequences'][frequence_pk] = frequence
-                        print(f"    ✓ Fréquence trouvée: pk={frequence_pk}")
+        frequences_by_service = self._index['frequences_by_service']
+        for service_pk in self.extracted['services']:
+            for frequence in frequences_by_service.get(service_pk, ()):
+                frequence_pk = frequence.get('pk')
+                self.extracted['frequences'][frequence_pk] = frequence
+                logger.debug("    ✓ Fréquence trouvée: pk=%s", frequence_pk)
     
     def generate_output_xml(self) -> str:
-        """Génère le XML de sortie conforme au schéma XSD avec formatage propre"""
-        
-        # Création de l'élément racine avec namespace SIA
-        root = ET.Element('SiaExport')
-        root.set('xmlns:sia', 'http://www.sia.aviation-civile.gouv.fr/siaexport')
-        root.set('xmlns:xsi', 'http://www.w3.org/2001/XMLSchema-instance')
-        root.set('xsi:schemaLocation', 'http://www.sia.aviation-civile.gouv.fr/siaexport Espace.xsd')
-        
-        # Ajout des sections selon l'ordre logique du schéma XSD
-        
-        if self.extracted['territoires']:
-            territoires_section = ET.SubElement(root, 'TerritoireS')
-            for territoire in self.extracted['territoires'].values():
-                territoires_section.append(territoire)
-        
-        if self.extracted['ads']:
-            ads_section = ET.SubElement(root, 'AdS')
-            for ad in self.extracted['ads'].values():
-                ads_section.append(ad)
-        
-        if self.extracted['espaces']:
-            espaces_section = ET.SubElement(root, 'EspaceS')
-            for espace in self.extracted['espaces'].values():
-                espaces_section.append(espace)
-        
-        if self.extracted['parties']:
-            parties_section = ET.SubElement(root, 'PartieS')
-            for partie in self.extracted['parties'].values():
-                parties_section.append(partie)
-        
-        if self.extracted['volumes']:
-            volumes_section = ET.SubElement(root, 'VolumeS')
-            for volume in self.extracted['volumes'].values():
-                volumes_section.append(volume)
-        
-        if self.extracted['services']:
-            services_section = ET.SubElement(root, 'ServiceS')
-            for service in self.extracted['services'].values():
-                services_section.append(service)
-        
-        if self.extracted['frequences']:
-            frequences_section = ET.SubElement(root, 'FrequenceS')
-            for frequence in self.extracted['frequences'].values():
-                frequences_section.append(frequence)
-        
-        # Formatage du XML avec indentation propre
-        return self._format_xml_clean(root)
-    
-    def _format_xml_clean(self, root: ET.Element) -> str:
-        """Formate le XML avec une indentation propre sans lignes vides excessives"""
-        
-        # Première passe : formatage de base
-        rough_string = ET.tostring(root, 'unicode', xml_declaration=False)
-        reparsed = minidom.parseString(rough_string)
-        pretty_xml = reparsed.toprettyxml(indent="  ", encoding=None)
-        
-        # Nettoyage des lignes vides excessives
-        lines = pretty_xml.split('\n')
-        
-        # Filtrage : suppression des lignes vides et espaces en trop
-        clean_lines = []
-        for line in lines:
-            # Ignorer les lignes vides ou contenant seulement des espaces
-            if line.strip():
-                clean_lines.append(line)
-        
-        # Remplacement de l'en-tête XML par défaut
-        if clean_lines and clean_lines[0].startswith('<?xml'):
-            clean_lines[0] = '<?xml version="1.0" encoding="ISO-8859-1"?>'
-        else:
-            clean_lines.insert(0, '<?xml version="1.0" encoding="ISO-8859-1"?>')
+        """
+        Génère le XML de sortie conforme au schéma XSD avec formatage propre
+        
+        Les sections sont écrites élément par élément dans un tampon, sans arbre de
+        sortie intermédiaire. Les éléments de self.extracted sont des références vers
+        l'arbre chargé et ne doivent pas être modifiés : seule une copie de chaque
+        élément est indentée avant sérialisation.
+        """
+        out = io.StringIO()
+        out.write('<?xml version="1.0" encoding="ISO-8859-1"?>\n')
+        
+        # Élément racine avec namespace SIA
+        out.write('<SiaExport xmlns:sia="http://www.sia.aviation-civile.gouv.fr/siaexport"'
+                  ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+                  ' xsi:schemaLocation="http://www.sia.aviation-civile.gouv.fr/siaexport Espace.xsd">\n')
+        
+        # Sections selon l'ordre logique du schéma XSD
+        for collection, section_tag in OUTPUT_SECTIONS:
+            elements = self.extracted[collection]
+            if not elements:
+                continue
+            out.write(f'  <{section_tag}>\n')
+            for elem in elements.values():
+                out.write('    ')
+                out.write(self._format_element(elem))
+                out.write('\n')
+            out.write(f'  </{section_tag}>\n')
+        
+        out.write('</SiaExport>')
+        return out.getvalue()
+    
+    def _format_element(self, elem: ET.Element) -> str:
+        """Sérialise une entité indentée au niveau de sa section, sans toucher à l'original"""
+        
+        # Copie propre à chaque entité : une Partie intégrée à son Espace est aussi
+        # écrite dans PartieS, avec une autre indentation
+        elem = copy.deepcopy(elem)
+        elem.tail = None
+        _indent(elem, space="  ", level=2)
+        # Balises vides au format historique (minidom) : "<Territoire pk="100"/>" et non
+        # "<Territoire pk="100" />" ; " />" ne peut pas apparaître ailleurs ('>' échappé)
+        return ET.tostring(elem, encoding='unicode').replace(' />', '/>')
+    
+    def extract_rows(self) -> Dict[str, List[tuple]]:
+        """
+        Transcrit les entités extraites en lignes, colonne par colonne
         
-        return '\n'.join(clean_lines)
+        Returns:
+            Dictionnaire table SQLite -> liste de tuples dans l'ordre de COLUMNS
+        """
+        rows = {}
+        for collection, table in TABLES:
+            getters = _COLUMN_GETTERS[table]
+            table_rows = []
+            for elem in self.extracted[collection].values():
+                # Premier enfant de chaque balise (équivalent de find), en un parcours
+                children = {}
+                for child in elem:
+                    children.setdefault(child.tag, child)
+                
+                row = []
+                for tag, attr in getters:
+                    if tag is None:
+                        row.append(elem.get(attr))
+                        continue
+                    child = children.get(tag)
+                    if child is None:
+                        row.append(None)
+                    elif attr is None:
+                        row.append(child.text)
+                    else:
+                        row.append(child.get(attr))
+                table_rows.append(tuple(row))
+            rows[table] = table_rows
+        return rows
+    
+    def bulk_load(self, conn: sqlite3.Connection) -> int:
+        """
+        Charge les entités extraites dans une base créée par schema_generator.py
+        
+        Un executemany par table dans une seule transaction (BEGIN IMMEDIATE), avec
+        synchronous désactivé le temps du chargement. Dans une transaction déjà
+        ouverte par l'appelant, les lignes y sont ajoutées sans la valider.
+        
+        Args:
+            conn: Connexion SQLite ouverte sur la base cible
+            
+        Returns:
+            Nombre de lignes insérées
+            
+        Raises:
+            sqlite3.Error: en cas d'échec (transaction propre annulée)
+        """
+        rows = self.extract_rows()
+        own_transaction = not conn.in_transaction
+        
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+        if own_transaction:
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = 0
+            for table, table_rows in rows.items():
+                if not table_rows:
+                    continue
+                columns = [name for name, _ in COLUMNS[table]]
+                # Valeurs XML en texte : l'affinité des colonnes INTEGER/REAL les convertit
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' * len(columns))})",
+                    table_rows
+                )
+                total += len(table_rows)
+            if own_transaction:
+                conn.commit()
+            return total
+        except sqlite3.Error:
+            if own_transaction:
+                conn.rollback()
+            raise
+        finally:
+            if own_transaction:
+                conn.execute(f"PRAGMA synchronous={synchronous}")
     
     def print_extraction_summary(self):
         """Affiche un résumé de l'extraction"""
@@ -374,15 +667,21 @@ def main():
 Exemples d'utilisation:
   python extract_espace.py --input input/XML_SIA_2025-10-02.xml --identifier "304333"
   python extract_espace.py --input input/XML_SIA_2025-10-02.xml --identifier "[LF][TMA LE BOURGET]" --output tma_bourget.xml
+  python extract_espace.py --input input/XML_SIA_2025-10-02.xml --identifier "[LF][TMA LE BOURGET]" "[LF][CTR PONTOISE]" --output-dir extraits/
+  python extract_espace.py --input input/XML_SIA_2025-10-02.xml --identifier "304333" --database sia_database.db
         """
     )
     
     parser.add_argument('--input', '-i', required=True,
                        help='Fichier XML SIA d\'entrée')
-    parser.add_argument('--identifier', '-id', required=True,
-                       help='Identifiant pk ou lk de l\'espace à extraire')
+    parser.add_argument('--identifier', '-id', required=True, nargs='+',
+                       help='Identifiant(s) pk ou lk des espaces à extraire (un fichier par espace, XML chargé une seule fois)')
     parser.add_argument('--output', '-o',
-                       help='Fichier XML de sortie (optionnel, affichage sur stdout par défaut)')
+                       help='Fichier XML de sortie (un seul identifiant ; nom dérivé du lk par défaut)')
+    parser.add_argument('--output-dir',
+                       help='Répertoire des fichiers de sortie (par défaut: data-output/ s\'il existe)')
+    parser.add_argument('--database',
+                       help='Base SQLite (créée par schema_generator.py) où charger aussi les entités extraites')
     parser.add_argument('--xsd',
                        help='Fichier XSD de validation (par défaut: schemas/Espace.xsd)')
     parser.add_argument('--verbose', '-v', action='store_true',
@@ -390,6 +689,15 @@ Exemples d'utilisation:
     
     args = parser.parse_args()
     
+    # Détail entité par entité uniquement en mode verbose (même flux que les print)
+    handler = _StdoutHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    
+    if args.output and len(args.identifier) > 1:
+        parser.error("--output n'accepte qu'un seul identifiant (utiliser --output-dir)")
+    
     # Vérification de l'existence du fichier d'entrée
     if not os.path.exists(args.input):
         print(f"✗ Fichier d'entrée non trouvé: {args.input}")
@@ -398,42 +706,69 @@ Exemples d'utilisation:
     # Initialisation de l'extracteur
     extractor = XsdBasedEspaceExtractor(args.input, args.xsd)
     
-    # Chargement du XML
+    # Chargement du XML (une seule fois pour tous les identifiants)
     if not extractor.load_xml():
         sys.exit(1)
     
-    # Extraction
-    print(f"\nExtraction de l'espace: {args.identifier}")
-    if not extractor.extract_espace_with_dependencies(args.identifier):
-        print("✗ Échec de l'extraction")
-        sys.exit(1)
+    output_dir = args.output_dir
+    if output_dir is None and os.path.exists('data-output'):
+        output_dir = 'data-output'
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
     
-    # Génération du XML de sortie
-    output_xml = extractor.generate_output_xml()
-    
-    # Déterminer le nom de fichier de sortie
-    if args.output:
-        output_filename = args.output
-    else:
-        # Générer un nom de fichier normalisé basé sur l'identifiant lk
-        output_filename = normalize_filename(extractor.target_espace_lk)
-        
-        # Placer dans data-output/ si le dossier existe
-        if os.path.exists('data-output'):
-            output_filename = os.path.join('data-output', output_filename)
-    
-    # Écrire le fichier XML
-    try:
-        with open(output_filename, 'w', encoding='iso-8859-1') as f:
-            f.write(output_xml)
-        print(f"\n✓ XML généré: {output_filename}")
-    except Exception as e:
-        print(f"✗ Erreur d'écriture: {e}")
-        sys.exit(1)
+    conn = sqlite3.connect(args.database) if args.database else None
     
-    # Résumé
-    if args.verbose:
-        extractor.print_extraction_summary()
+    failures = 0
+    for identifier in args.identifier:
+        extractor.reset_extracted()
+        
+        # Extraction
+        print(f"\nExtraction de l'espace: {identifier}")
+        if not extractor.extract_espace_with_dependencies(identifier):
+            print("✗ Échec de l'extraction")
+            failures += 1
+            continue
+        
+        # Génération du XML de sortie
+        output_xml = extractor.generate_output_xml()
+        
+        # Déterminer le nom de fichier de sortie
+        if args.output:
+            output_filename = args.output
+        else:
+            # Générer un nom de fichier normalisé basé sur l'identifiant lk
+            output_filename = normalize_filename(extractor.target_espace_lk)
+            if output_dir:
+                output_filename = os.path.join(output_dir, output_filename)
+        
+        # Écrire le fichier XML
+        try:
+            with open(output_filename, 'w', encoding='iso-8859-1') as f:
+                f.write(output_xml)
+            print(f"\n✓ XML généré: {output_filename}")
+        except Exception as e:
+            print(f"✗ Erreur d'écriture: {e}")
+            failures += 1
+            continue
+        
+        # Chargement en base (sans relire le XML généré)
+        if conn is not None:
+            try:
+                loaded = extractor.bulk_load(conn)
+                print(f"✓ {loaded} enregistrements chargés dans: {args.database}")
+            except sqlite3.Error as e:
+                print(f"✗ Erreur SQLite: {e}")
+                failures += 1
+        
+        # Résumé
+        if args.verbose:
+            extractor.print_extraction_summary()
+    
+    if conn is not None:
+        conn.close()
+    
+    if failures:
+        sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
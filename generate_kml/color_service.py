@@ -4,6 +4,7 @@ Basé sur les règles OACI et le fichier de configuration color_rules.csv
 """
 
 import csv
+import functools
 import os
 from typing import Dict, Tuple, Optional
 from pathlib import Path
@@ -134,6 +135,7 @@ class ColorService:
         """Recharge le fichier de configuration."""
         self.color_rules.clear()
         self._load_color_rules()
+        get_space_color.cache_clear()
 
 
 # Instance globale du service (singleton pattern)
@@ -157,6 +159,7 @@ def get_color_service(config_file: str = None) -> ColorService:
 
 
 # Fonctions utilitaires pour un usage simple
+@functools.lru_cache(maxsize=512)
 def get_space_color(type_espace: str, classe: Optional[str] = None, 
                    format_type: str = 'kml') -> str:
     """
@@ -5,10 +5,17 @@ Extracteur optimisé qui met l'accent sur les parties d'espaces et simplifie la
 """
 
 import sqlite3
+import json
 import argparse
+import functools
+import logging
 import sys
 import os
 import re
+import math
+from contextlib import contextmanager
+from itertools import islice
+from statistics import fmean
 from typing import List, Dict, Optional, Tuple
 from xml.dom import minidom
 import xml.etree.ElementTree as ET
@@ -16,6 +23,291 @@ import xml.etree.ElementTree as ET
 # Import du service de couleurs
 from color_service import get_space_color
 
+# Définition du plancher en pieds partagée avec le schéma (utils/schema_generator.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from schema_generator import PLANCHER_FT_EXPR, PLANCHER_FT_COLUMN
+
+# Détails de géométrie (cercles) journalisés en DEBUG : hors de la sortie console
+logger = logging.getLogger(__name__)
+
+# Expressions compilées une fois : contours (cercle "cir(lat lon:rayon:unité)", couples
+# lat/lon) et valeurs numériques des altitudes
+_CIRCLE_RE = re.compile(r'cir\(([-+]?\d+\.?\d*)\s+([-+]?\d+\.?\d*):(\d+\.?\d*):([A-Z]+)')
+_COORD_RE = re.compile(r'(\d+\.?\d*)\s+(\d+\.?\d*)')
+_NON_NUMERIC_RE = re.compile(r'[^\d.]')
+
+# Emprise France retenue pour les couples lat/lon des contours
+_FRANCE_BBOX = (40.0, 55.0, -10.0, 10.0)
+_LAT_MIN, _LAT_MAX, _LON_MIN, _LON_MAX = _FRANCE_BBOX
+
+# Conversions d'altitude vers les mètres (précalculées, UNL : plafond FL195 / plancher FL180)
+_FT_TO_M = 0.3048
+_FL_TO_M = 30.48
+_UNL_CEILING_M = 5943.6
+_UNL_FLOOR_M = 5486.4
+
+# Élévations de surface approximatives par région : ((lat_min, lat_max, lon_min, lon_max), élévation en m)
+# Ordonnées de la plus petite à la plus grande, les zones pouvant s'imbriquer (Bourget ⊂ Paris)
+_ELEVATION_ZONES = (
+    ((48.8, 49.0, 2.3, 2.6), 60.0),     # Bourget (proche Paris)
+    ((45.5, 46.2, 0.8, 1.8), 350.0),    # Limoges (45.8°N, 1.2°E)
+    ((48.3, 49.3, 1.8, 2.8), 100.0),    # Paris (48.8°N, 2.3°E)
+    ((42.0, 52.0, -5.0, 10.0), 200.0),  # France métropolitaine (moyenne)
+)
+
+
+# Helpers de géométrie et d'altitude partagés par KMLExtractor et l'export Google Earth
+# (google_earth_export) : un contour est parsé pour l'élévation puis pour la géométrie,
+# et les mêmes contours reviennent d'un export à l'autre, d'où les caches
+
+@functools.lru_cache(maxsize=4096)
+def parse_contour(contour: str) -> tuple:
+    """
+    Parse les coordonnées depuis le champ 'contour' (résultat mis en cache)
+    Gère les coordonnées classiques ET les définitions géométriques (cercles)
+    
+    Args:
+        contour: Texte du contour
+        
+    Returns:
+        Tuple de coordonnées (lat, lon), immuable car partagé par le cache
+    """
+    coordinates = []
+    
+    if not contour:
+        return ()
+    
+    lines = contour.strip().split('\n')
+    
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        
+        # Vérifier s'il y a une définition de cercle
+        circle_match = _CIRCLE_RE.search(line)
+        
+        if circle_match:
+            # C'est un cercle - générer des points sur le périmètre
+            center_lat = float(circle_match.group(1))
+            center_lon = float(circle_match.group(2))
+            radius = float(circle_match.group(3))
+            unit = circle_match.group(4)
+            
+            # Convertir le rayon en degrés (approximation)
+            if unit == 'NM':  # Nautical Miles
+                radius_deg = radius / 60.0  # 1 degré ≈ 60 NM
+            elif unit == 'KM':
+                radius_deg = radius / 111.0  # 1 degré ≈ 111 km
+            elif unit == 'M':
+                radius_deg = radius / 111000.0  # 1 degré ≈ 111000 m
+            else:
+                radius_deg = radius / 60.0  # Par défaut, supposer NM
+            
+            # Générer 36 points sur le cercle (tous les 10 degrés), +1 pour fermer le cercle
+            # Approximation simple (valable pour les petites distances)
+            num_points = 36
+            cos_lat0 = math.cos(math.radians(center_lat))
+            for i in range(num_points + 1):
+                angle = (i * 2 * math.pi) / num_points
+                lat = center_lat + radius_deg * math.cos(angle)
+                lon = center_lon + radius_deg * math.sin(angle) / cos_lat0
+                coordinates.append((lat, lon))
+            
+            # Journalisé au premier parse seulement (résultat mis en cache)
+            logger.debug("🔵 Cercle détecté: centre(%.3f, %.3f), rayon %s %s → %s points",
+                         center_lat, center_lon, radius, unit, len(coordinates))
+            return tuple(coordinates)
+        
+        # Sinon, parser les coordonnées classiques
+        # (premier couple dans l'emprise France ; la longitude n'est convertie que si la latitude y est)
+        for lat_text, lon_text in _COORD_RE.findall(line):
+            lat = float(lat_text)
+            if not _LAT_MIN <= lat <= _LAT_MAX:
+                continue
+            lon = float(lon_text)
+            if _LON_MIN <= lon <= _LON_MAX:
+                coordinates.append((lat, lon))
+                break
+    
+    return tuple(coordinates)
+
+
+# Conversion d'une valeur d'altitude en mètres selon la famille d'unité
+_UNIT_TO_METERS = {
+    'FL': lambda value: value * _FL_TO_M,
+    'ft': lambda value: value * _FT_TO_M,
+    'm': lambda value: value,
+}
+
+
+@functools.lru_cache(maxsize=64)
+def _classify_unit(ref_unite: str) -> tuple:
+    """
+    Classe une référence d'altitude (peu de valeurs distinctes, résultat mis en cache)
+    
+    Args:
+        ref_unite: Référence/unité de l'altitude (SFC, UNL, FL, ft AMSL, ft ASFC, m ...)
+        
+    Returns:
+        Tuple (famille, ajout de l'élévation de surface), famille parmi
+        'SFC', 'UNL', 'FL', 'ft' et 'm' (les unités inconnues sont traitées en pieds)
+    """
+    if ref_unite in ("SFC", "UNL"):
+        return ref_unite, False
+    if ref_unite.startswith("FL"):
+        return 'FL', False
+    
+    unite = ref_unite.lower()
+    if "ft" in unite:
+        return 'ft', "ASFC" in ref_unite
+    if "m" in unite:
+        return 'm', "ASFC" in ref_unite
+    return 'ft', False
+
+
+def altitude_to_meters(altitude: str, ref_unite: str, is_ceiling: bool = True,
+                       surface_elevation: float = 0.0) -> float:
+    """
+    Convertit une altitude en mètres selon l'unité de référence
+    
+    Args:
+        altitude: Valeur de l'altitude (texte ou nombre)
+        ref_unite: Référence/unité de l'altitude (SFC, UNL, FL, ft AMSL, ft ASFC, m ...)
+        is_ceiling: Plafond (UNL : FL195) ou plancher (UNL : FL180)
+        surface_elevation: Élévation de surface ajoutée aux hauteurs ASFC
+        
+    Returns:
+        Altitude en mètres (0.0 si la valeur est illisible)
+    """
+    if not ref_unite:
+        return 0.0
+    
+    kind, add_surface = _classify_unit(ref_unite)
+    
+    try:
+        if kind == "SFC":
+            return surface_elevation
+        elif kind == "UNL":
+            return _UNL_CEILING_M if is_ceiling else _UNL_FLOOR_M
+        
+        if isinstance(altitude, str):
+            altitude_clean = _NON_NUMERIC_RE.sub('', altitude)
+            if not altitude_clean:
+                return 0.0
+            altitude_val = float(altitude_clean)
+        else:
+            altitude_val = float(altitude)
+        
+        altitude_m = _UNIT_TO_METERS[kind](altitude_val)
+        return surface_elevation + altitude_m if add_surface else altitude_m
+            
+    except (ValueError, TypeError):
+        return 0.0
+
+
+@functools.lru_cache(maxsize=4096)
+def contour_surface_elevation(contour: str) -> float:
+    """
+    Estime l'élévation de surface basée sur la géométrie de l'espace
+    Approximation basée sur des données connues pour les régions françaises
+    
+    Args:
+        contour: Texte du contour
+        
+    Returns:
+        Élévation en mètres (0.0 hors des zones connues)
+    """
+    if not contour:
+        return 0.0
+    
+    # Extraire les coordonnées pour estimer la région : même entrée de cache que la
+    # géométrie de la partie, pas de second parsing (le centre exact reste nécessaire,
+    # un premier point seul pourrait tomber dans une autre zone que le centroïde)
+    coordinates = parse_contour(contour)
+    if not coordinates:
+        return 0.0
+    
+    # Calculer le centre approximatif
+    lats, lons = zip(*coordinates)
+    center_lat = fmean(lats)
+    center_lon = fmean(lons)
+    
+    # Première zone (la plus petite) contenant le centre
+    for (lat_min, lat_max, lon_min, lon_max), elevation in _ELEVATION_ZONES:
+        if lat_min <= center_lat <= lat_max and lon_min <= center_lon <= lon_max:
+            return elevation
+    
+    # Défaut
+    return 0.0
+
+
+def part_altitude_range(part: Dict) -> Tuple[float, float]:
+    """
+    Calcule la plage d'altitude pour une partie (min plancher, max plafond)
+    
+    Args:
+        part: Partie avec son contour et ses volumes
+        
+    Returns:
+        Tuple (plancher minimal, plafond maximal) en mètres
+    """
+    volumes = part['volumes']
+    if not volumes:
+        return 0.0, 1000.0  # Valeurs par défaut
+    
+    # Estimer l'élévation de surface basée sur la géométrie
+    elevation = contour_surface_elevation(part.get('contour', ''))
+    
+    # Cas le plus courant (CTR, petites zones R/D) : un seul volume, pas de réduction
+    if len(volumes) == 1:
+        volume = volumes[0]
+        return (
+            altitude_to_meters(volume['plancher'], volume['plancher_ref_unite'],
+                               is_ceiling=False, surface_elevation=elevation),
+            altitude_to_meters(volume['plafond'], volume['plafond_ref_unite'],
+                               is_ceiling=True, surface_elevation=elevation),
+        )
+    
+    floors = [
+        altitude_to_meters(volume['plancher'], volume['plancher_ref_unite'],
+                           is_ceiling=False, surface_elevation=elevation)
+        for volume in volumes
+    ]
+    ceilings = [
+        altitude_to_meters(volume['plafond'], volume['plafond_ref_unite'],
+                           is_ceiling=True, surface_elevation=elevation)
+        for volume in volumes
+    ]
+    
+    return min(floors, default=0.0), max(ceilings, default=1000.0)
+
+# Réglages de connexion pour les exports (lectures intensives, écritures rares), propres
+# à la connexion : le mode de journal, persistant dans le fichier, n'est pas modifié
+CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",       # 64 Mo de cache de pages
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",     # 256 Mo en mémoire mappée
+]
+
+# Colonnes dérivées utilisées par les filtres d'export (table, colonne, définition)
+QUERY_COLUMNS = [
+    ('volumes', 'plancher_ft', PLANCHER_FT_COLUMN),
+]
+
+# Index nécessaires aux filtres par mot-clé, classe et altitude (nom, définition)
+QUERY_INDEXES = [
+    ('idx_espaces_lk', "CREATE INDEX IF NOT EXISTS idx_espaces_lk ON espaces(lk)"),
+    ('idx_espaces_lk_nocase',
+     "CREATE INDEX IF NOT EXISTS idx_espaces_lk_nocase ON espaces(lk COLLATE NOCASE)"),
+    ('idx_parties_espace', "CREATE INDEX IF NOT EXISTS idx_parties_espace ON parties(espace_ref)"),
+    ('idx_volumes_partie_classe',
+     "CREATE INDEX IF NOT EXISTS idx_volumes_partie_classe ON volumes(partie_ref, classe)"),
+    ('idx_volumes_partie_plancher_ft',
+     "CREATE INDEX IF NOT EXISTS idx_volumes_partie_plancher_ft ON volumes(partie_ref, plancher_ft)"),
+]
+
 class KMLExtractor:
     """
     Extracteur KML amélioré qui:
@@ -37,12 +329,92 @@ class KMLExtractor:
             
             self.db_connection = sqlite3.connect(self.database_path)
             print(f"✓ Connecté à la base: {self.database_path}")
+            self.configure_connection()
+            self.ensure_query_schema()
             return True
-            
+
         except sqlite3.Error as e:
             print(f"✗ Erreur de connexion SQLite: {e}")
             return False
-    
+
+    def configure_connection(self) -> None:
+        """Applique les PRAGMA de CONNECTION_PRAGMAS à la connexion (chacun indépendamment)"""
+        for pragma in CONNECTION_PRAGMAS:
+            try:
+                self.db_connection.execute(pragma)
+            except sqlite3.Error as e:
+                # Réglage refusé : valeur par défaut conservée, les suivants restent appliqués
+                print(f"⚠ Réglage de connexion non appliqué ({pragma}): {e}")
+
+    @contextmanager
+    def read_transaction(self):
+        """
+        Regroupe une série de lectures dans une seule transaction
+        (un seul verrou partagé au lieu d'un par requête)
+        """
+        if self.db_connection.in_transaction:
+            yield
+            return
+        self.db_connection.execute("BEGIN")
+        try:
+            yield
+        finally:
+            self.db_connection.commit()
+
+    def ensure_query_schema(self) -> None:
+        """
+        Crée les colonnes dérivées et les index utilisés par les filtres des exports
+        (bases créées avant leur ajout dans schema_generator.py)
+        """
+        try:
+            cursor = self.db_connection.cursor()
+            missing_columns = []
+            for table, column, definition in QUERY_COLUMNS:
+                # table_xinfo liste aussi les colonnes générées
+                cursor.execute(f"PRAGMA table_xinfo({table})")
+                if column not in {row[1] for row in cursor.fetchall()}:
+                    missing_columns.append(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+            existing = {row[0] for row in cursor.fetchall()}
+            missing_indexes = [sql for name, sql in QUERY_INDEXES if name not in existing]
+            if not missing_columns and not missing_indexes:
+                return
+
+            for ddl in missing_columns + missing_indexes:
+                cursor.execute(ddl)
+            # Statistiques pour que le planificateur choisisse les nouveaux index
+            cursor.execute("ANALYZE")
+            self.db_connection.commit()
+
+        except sqlite3.Error as e:
+            # Base en lecture seule par exemple : les requêtes restent valides sans index
+            print(f"⚠ Colonnes/index de recherche non créés: {e}")
+
+    def has_column(self, table: str, column: str) -> bool:
+        """Indique si une colonne (y compris générée) existe dans une table"""
+        cursor = self.db_connection.cursor()
+        cursor.execute(f"PRAGMA table_xinfo({table})")
+        return column in {row[1] for row in cursor.fetchall()}
+
+    def get_min_floor_ft_by_espace(self) -> Dict[int, float]:
+        """
+        Calcule le plancher minimal (pieds) de chaque espace en une seule lecture des volumes
+        Même expression que la colonne plancher_ft (PLANCHER_FT_EXPR), pour les bases sans
+        colonnes générées
+        
+        Returns:
+            Dictionnaire pk espace -> plancher minimal en pieds
+        """
+        cursor = self.db_connection.cursor()
+        cursor.execute(f"""
+            SELECT p.espace_ref, MIN({PLANCHER_FT_EXPR})
+            FROM volumes v
+            JOIN parties p ON v.partie_ref = p.pk
+            GROUP BY p.espace_ref
+        """)
+        return dict(cursor.fetchall())
+
     def close_connection(self):
         """Ferme la connexion à la base de données"""
         if self.db_connection:
@@ -69,6 +441,36 @@ class KMLExtractor:
             'altr_ft': row[4]
         }
     
+    def get_airspaces_by_lks(self, lks: List[str]) -> List[Dict]:
+        """
+        Récupère plusieurs espaces aériens en une seule requête
+        
+        Args:
+            lks: Identifiants lk des espaces
+            
+        Returns:
+            Espaces trouvés, triés par type puis par lk
+        """
+        cursor = self.db_connection.cursor()
+        # Liste passée en un seul paramètre JSON (pas de limite sur le nombre de variables)
+        cursor.execute("""
+            SELECT pk, lk, nom, type_espace, altr_ft
+            FROM espaces 
+            WHERE lk IN (SELECT value FROM json_each(?))
+            ORDER BY type_espace, lk
+        """, (json.dumps(list(lks)),))
+        
+        return [
+            {
+                'pk': row[0],
+                'lk': row[1],
+                'nom': row[2],
+                'type_espace': row[3],
+                'altr_ft': row[4]
+            }
+            for row in cursor.fetchall()
+        ]
+    
     def get_airspace_by_pk(self, pk: int) -> Optional[Dict]:
         """Récupère un espace aérien par son identifiant pk"""
         cursor = self.db_connection.cursor()
@@ -167,116 +569,15 @@ class KMLExtractor:
         """
         Parse les coordonnées depuis le champ 'contour'
         Gère les coordonnées classiques ET les définitions géométriques (cercles)
+        (copie modifiable du résultat en cache de parse_contour)
         """
-        import math
-        coordinates = []
-        
-        if not contour:
-            return coordinates
-        
-        lines = contour.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Vérifier s'il y a une définition de cercle
-            circle_pattern = r'cir\(([-+]?\d+\.?\d*)\s+([-+]?\d+\.?\d*):(\d+\.?\d*):([A-Z]+)'
-            circle_match = re.search(circle_pattern, line)
-            
-            if circle_match:
-                # C'est un cercle - générer des points sur le périmètre
-                center_lat = float(circle_match.group(1))
-                center_lon = float(circle_match.group(2))
-                radius = float(circle_match.group(3))
-                unit = circle_match.group(4)
-                
-                # Convertir le rayon en degrés (approximation)
-                if unit == 'NM':  # Nautical Miles
-                    radius_deg = radius / 60.0  # 1 degré ≈ 60 NM
-                elif unit == 'KM':
-                    radius_deg = radius / 111.0  # 1 degré ≈ 111 km
-                elif unit == 'M':
-                    radius_deg = radius / 111000.0  # 1 degré ≈ 111000 m
-                else:
-                    radius_deg = radius / 60.0  # Par défaut, supposer NM
-                
-                # Générer 36 points sur le cercle (tous les 10 degrés)
-                num_points = 36
-                for i in range(num_points + 1):  # +1 pour fermer le cercle
-                    angle = (i * 2 * math.pi) / num_points
-                    
-                    # Approximation simple (valable pour les petites distances)
-                    lat = center_lat + radius_deg * math.cos(angle)
-                    lon = center_lon + radius_deg * math.sin(angle) / math.cos(math.radians(center_lat))
-                    
-                    coordinates.append((lat, lon))
-                
-                print(f"   🔵 Cercle détecté: centre({center_lat:.3f}, {center_lon:.3f}), rayon {radius} {unit} → {len(coordinates)} points")
-                return coordinates
-            
-            # Sinon, parser les coordonnées classiques
-            coord_pattern = r'(\d+\.?\d*)\s+(\d+\.?\d*)'
-            matches = re.findall(coord_pattern, line)
-            
-            for match in matches:
-                try:
-                    lat = float(match[0])
-                    lon = float(match[1])
-                    if 40 <= lat <= 55 and -10 <= lon <= 10:
-                        coordinates.append((lat, lon))
-                        break
-                except ValueError:
-                    continue
-        
-        return coordinates
+        return list(parse_contour(contour))
     
     def parse_altitude_to_meters(self, altitude: str, ref_unite: str, is_ceiling: bool = True, surface_elevation: float = 0.0) -> float:
         """
-        Convertit une altitude en mètres selon l'unité de référence
-        Version simplifiée de l'original
+        Convertit une altitude en mètres selon l'unité de référence (voir altitude_to_meters)
         """
-        if not ref_unite:
-            return 0.0
-        
-        try:
-            if ref_unite == "SFC":
-                return surface_elevation
-            
-            elif ref_unite == "UNL":
-                if is_ceiling:
-                    return 19500 * 0.3048  # FL195
-                else:
-                    return 18000 * 0.3048
-            
-            # Extraire la valeur numérique
-            if isinstance(altitude, str):
-                altitude_clean = re.sub(r'[^\d.]', '', altitude)
-                if not altitude_clean:
-                    return 0.0
-                altitude_val = float(altitude_clean)
-            else:
-                altitude_val = float(altitude)
-            
-            # Conversion selon l'unité
-            if ref_unite.startswith("FL"):
-                return altitude_val * 100 * 0.3048  # FL en mètres
-            elif "ft" in ref_unite.lower():
-                if "ASFC" in ref_unite:
-                    return surface_elevation + (altitude_val * 0.3048)
-                else:  # AMSL
-                    return altitude_val * 0.3048
-            elif "m" in ref_unite.lower():
-                if "ASFC" in ref_unite:
-                    return surface_elevation + altitude_val
-                else:  # AMSL
-                    return altitude_val
-            else:
-                return altitude_val * 0.3048  # Défaut en pieds
-                
-        except (ValueError, TypeError):
-            return 0.0
+        return altitude_to_meters(altitude, ref_unite, is_ceiling, surface_elevation)
     
     def create_multigeometry_3d(self, parent_element, coordinates, min_floor, max_ceiling):
         """
@@ -288,131 +589,79 @@ class KMLExtractor:
             min_floor: Altitude du plancher en mètres
             max_ceiling: Altitude du plafond en mètres
         """
-        import xml.etree.ElementTree as ET
-        
-        # Géométrie 3D complète (plancher + plafond + murs)
-        multi_geometry = ET.SubElement(parent_element, 'MultiGeometry')
-        
-        # 1. Polygone plancher
-        floor_polygon = ET.SubElement(multi_geometry, 'Polygon')
-        floor_altitude_mode = ET.SubElement(floor_polygon, 'altitudeMode')
-        floor_altitude_mode.text = 'absolute'
-        floor_outer = ET.SubElement(floor_polygon, 'outerBoundaryIs')
-        floor_ring = ET.SubElement(floor_outer, 'LinearRing')
-        floor_coords = ET.SubElement(floor_ring, 'coordinates')
-        
-        # Coordonnées plancher (sens horaire pour face vers le bas)
-        floor_coord_strings = []
-        for lat, lon in reversed(coordinates):  # Inverser pour orientation correcte
-            floor_coord_strings.append(f"{lon},{lat},{min_floor}")
-        floor_coords.text = ' '.join(floor_coord_strings)
-        
-        # 2. Polygone plafond  
-        ceiling_polygon = ET.SubElement(multi_geometry, 'Polygon')
-        ceiling_altitude_mode = ET.SubElement(ceiling_polygon, 'altitudeMode')
-        ceiling_altitude_mode.text = 'absolute'
-        ceiling_outer = ET.SubElement(ceiling_polygon, 'outerBoundaryIs')
-        ceiling_ring = ET.SubElement(ceiling_outer, 'LinearRing')
-        ceiling_coords = ET.SubElement(ceiling_ring, 'coordinates')
-        
-        # Coordonnées plafond (sens antihoraire pour face vers le haut)
-        ceiling_coord_strings = []
-        for lat, lon in coordinates:
-            ceiling_coord_strings.append(f"{lon},{lat},{max_ceiling}")
-        ceiling_coords.text = ' '.join(ceiling_coord_strings)
-        
-        # 3. Murs (un polygone vertical par segment)
-        for i in range(len(coordinates) - 1):  # -1 car dernier point = premier
-            lat1, lon1 = coordinates[i]
-            lat2, lon2 = coordinates[i + 1]
-            
-            # Créer un polygone vertical pour ce segment
-            wall_polygon = ET.SubElement(multi_geometry, 'Polygon')
-            wall_altitude_mode = ET.SubElement(wall_polygon, 'altitudeMode')
-            wall_altitude_mode.text = 'absolute'
-            wall_outer = ET.SubElement(wall_polygon, 'outerBoundaryIs')
-            wall_ring = ET.SubElement(wall_outer, 'LinearRing')
-            wall_coords = ET.SubElement(wall_ring, 'coordinates')
-            
-            # Rectangle vertical : bas1 -> haut1 -> haut2 -> bas2 -> bas1
-            wall_coord_strings = [
-                f"{lon1},{lat1},{min_floor}",      # Point 1 plancher
-                f"{lon1},{lat1},{max_ceiling}",    # Point 1 plafond
-                f"{lon2},{lat2},{max_ceiling}",    # Point 2 plafond
-                f"{lon2},{lat2},{min_floor}",      # Point 2 plancher
-                f"{lon1},{lat1},{min_floor}"       # Fermeture
-            ]
-            wall_coords.text = ' '.join(wall_coord_strings)
-        
+        # Toute la géométrie dans un seul fragment texte parsé une fois (au lieu de 5 SubElement
+        # par mur), puis un seul rattachement au parent
+        multi_geometry = ET.fromstring(self.multigeometry_3d_xml(coordinates, min_floor, max_ceiling))
+        parent_element.append(multi_geometry)
         return multi_geometry
 
-    def estimate_surface_elevation(self, contour: str) -> float:
-        """
-        Estime l'élévation de surface basée sur la géométrie de l'espace
-        Approximation basée sur des données connues pour les régions françaises
+    def multigeometry_3d_xml(self, coordinates, min_floor, max_ceiling) -> str:
         """
-        if not contour:
-            return 0.0
-        
-        # Extraire les coordonnées pour estimer la région
-        coordinates = self.parse_contour_coordinates(contour)
-        if not coordinates:
-            return 0.0
-        
-        # Calculer le centre approximatif
-        center_lat = sum(coord[0] for coord in coordinates) / len(coordinates)
-        center_lon = sum(coord[1] for coord in coordinates) / len(coordinates)
+        Construit le texte XML d'une MultiGeometry 3D (plancher + plafond + murs)
         
-        # Approximations basées sur les régions françaises
-        # Limoges area (45.8°N, 1.2°E) : ~350m
-        if 45.5 <= center_lat <= 46.2 and 0.8 <= center_lon <= 1.8:
-            return 350.0
-        
-        # Paris area (48.8°N, 2.3°E) : ~100m
-        elif 48.3 <= center_lat <= 49.3 and 1.8 <= center_lon <= 2.8:
-            return 100.0
-        
-        # Bourget area (proche Paris) : ~60m
-        elif 48.8 <= center_lat <= 49.0 and 2.3 <= center_lon <= 2.6:
-            return 60.0
-        
-        # France métropolitaine générale : ~200m (moyenne)
-        elif 42.0 <= center_lat <= 52.0 and -5.0 <= center_lon <= 10.0:
-            return 200.0
+        Args:
+            coordinates: Liste de tuples (lat, lon) définissant le contour
+            min_floor: Altitude du plancher en mètres
+            max_ceiling: Altitude du plafond en mètres
+            
+        Returns:
+            Fragment XML <MultiGeometry>
+        """
+        polygons = "".join([
+            "<Polygon><altitudeMode>absolute</altitudeMode><outerBoundaryIs><LinearRing>"
+            f"<coordinates>{ring}</coordinates>"
+            "</LinearRing></outerBoundaryIs></Polygon>"
+            for ring in self.multigeometry_3d_rings(coordinates, min_floor, max_ceiling)
+        ])
+        return f"<MultiGeometry>{polygons}</MultiGeometry>"
+
+    def multigeometry_3d_rings(self, coordinates, min_floor, max_ceiling) -> List[str]:
+        """
+        Texte <coordinates> de chaque polygone de la géométrie 3D (plancher, plafond, murs)
         
-        # Défaut
-        return 0.0
+        Args:
+            coordinates: Liste de tuples (lat, lon) définissant le contour
+            min_floor: Altitude du plancher en mètres
+            max_ceiling: Altitude du plafond en mètres
+            
+        Returns:
+            Liste des anneaux "lon,lat,alt lon,lat,alt ..."
+        """
+        # Altitudes formatées une seule fois par volume (repr d'un float == str)
+        floor_s = repr(min_floor)
+        ceil_s = repr(max_ceiling)
+        
+        # "lon,lat" de chaque sommet formaté une seule fois (réutilisé plancher, plafond et murs)
+        prefixes = ["%r,%r" % (lon, lat) for lat, lon in coordinates]
+        
+        # 1. Polygone plancher (sens horaire pour face vers le bas)
+        # 2. Polygone plafond (sens antihoraire pour face vers le haut)
+        # join sur des listes en compréhension (plus rapide qu'un générateur ou des append)
+        rings = [
+            ' '.join([f"{p},{floor_s}" for p in reversed(prefixes)]),
+            ' '.join([f"{p},{ceil_s}" for p in prefixes]),
+        ]
+        
+        # 3. Murs (un polygone vertical par segment, -1 car dernier point = premier)
+        # Rectangle vertical : bas1 -> haut1 -> haut2 -> bas2 -> bas1
+        rings.extend([
+            f"{p1},{floor_s} {p1},{ceil_s} {p2},{ceil_s} {p2},{floor_s} {p1},{floor_s}"
+            for p1, p2 in zip(prefixes, islice(prefixes, 1, None))
+        ])
+        
+        return rings
+
+    def estimate_surface_elevation(self, contour: str) -> float:
+        """
+        Estime l'élévation de surface basée sur la géométrie de l'espace (voir contour_surface_elevation)
+        """
+        return contour_surface_elevation(contour)
 
     def get_part_altitude_range(self, part: Dict) -> Tuple[float, float]:
         """
         Calcule la plage d'altitude pour une partie (min plancher, max plafond)
         """
-        if not part['volumes']:
-            return 0.0, 1000.0  # Valeurs par défaut
-        
-        # Estimer l'élévation de surface basée sur la géométrie
-        surface_elevation = self.estimate_surface_elevation(part.get('contour', ''))
-        min_floor = float('inf')
-        max_ceiling = float('-inf')
-        
-        for volume in part['volumes']:
-            floor_alt = self.parse_altitude_to_meters(
-                volume['plancher'], 
-                volume['plancher_ref_unite'], 
-                is_ceiling=False, 
-                surface_elevation=surface_elevation
-            )
-            ceiling_alt = self.parse_altitude_to_meters(
-                volume['plafond'], 
-                volume['plafond_ref_unite'], 
-                is_ceiling=True, 
-                surface_elevation=surface_elevation
-            )
-            
-            min_floor = min(min_floor, floor_alt)
-            max_ceiling = max(max_ceiling, ceiling_alt)
-        
-        return min_floor if min_floor != float('inf') else 0.0, max_ceiling if max_ceiling != float('-inf') else 1000.0
+        return part_altitude_range(part)
     
     def create_simplified_kml_document(self, airspace: Dict, parts: List[Dict]) -> str:
         """
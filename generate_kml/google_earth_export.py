@@ -5,14 +5,129 @@ Permet l'export flexible d'espaces aériens selon différents critères
 """
 
 import argparse
+import concurrent.futures
+import contextlib
+import functools
+import io
+import itertools
 import sys
 import os
 import subprocess
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
+from xml.sax.saxutils import XMLGenerator
+
+# lxml (implémentation C) si disponible, même API que ElementTree pour l'usage qui en est fait ici
+# Règle : ne jamais construire un texte d'élément par concaténations successives
+# (`elem.text += ...`, quadratique) ; accumuler dans une liste et assigner `.text` une
+# seule fois, écrire en flux (voir KMLStreamWriter), ou générer le fragment complet
+# (voir extractor.multigeometry_3d_xml).
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
 
 # Import des services
 sys.path.insert(0, os.path.dirname(__file__))
-from extractor import KMLExtractor
+from extractor import KMLExtractor, parse_contour, part_altitude_range
+from color_service import get_space_color
+
+# Conversion mètres vers pieds (affichage des altitudes, standard aéronautique)
+FT_PER_M = 3.28084
+
+# Emplacements possibles de Google Earth Pro
+GOOGLE_EARTH_PATHS = [
+    r"C:\Program Files\Google\Google Earth Pro\client\googleearth.exe",
+    r"C:\Program Files (x86)\Google\Google Earth Pro\client\googleearth.exe",
+    r"C:\Program Files\Google\Google Earth Pro\googleearth.exe",
+    r"C:\Program Files (x86)\Google\Google Earth Pro\googleearth.exe"
+]
+
+
+@functools.lru_cache(maxsize=1)
+def _find_google_earth() -> Optional[str]:
+    """
+    Recherche l'exécutable de Google Earth Pro (une seule fois par processus)
+    
+    Returns:
+        Chemin de l'exécutable ou None s'il n'est pas installé
+    """
+    for path in GOOGLE_EARTH_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class KMLStreamWriter(XMLGenerator):
+    """
+    Écriture SAX du KML directement dans un flux, indentée comme ET.indent
+    (deux espaces par niveau, kml = niveau 0)
+    """
+    
+    def __init__(self, out):
+        super().__init__(out, encoding='utf-8', short_empty_elements=True)
+    
+    def start(self, tag: str, level: int) -> None:
+        """Ouvre un élément à la profondeur donnée"""
+        self.ignorableWhitespace('\n' + '  ' * level)
+        self.startElement(tag, {})
+    
+    def end(self, tag: str, level: int) -> None:
+        """Ferme un élément ayant des enfants"""
+        self.ignorableWhitespace('\n' + '  ' * level)
+        self.endElement(tag)
+    
+    def text_element(self, tag: str, text: Optional[str], level: int) -> None:
+        """Écrit un élément feuille et son texte (échappé)"""
+        self.start(tag, level)
+        self.characters(text or '')
+        self.endElement(tag)
+
+
+# Nombre d'espaces à partir duquel les dossiers sont construits par un pool de processus
+PARALLEL_MIN_SPACES = 200
+
+# Pool persistant (réutilisé d'un export à l'autre) et exporteur propre à chaque processus
+_worker_pool = None
+_worker_pool_database = None
+_worker_exporter = None
+
+
+def _init_worker(database_path: str) -> None:
+    """Ouvre la connexion SQLite propre à un processus de travail"""
+    global _worker_exporter
+    _worker_exporter = GoogleEarthExporter(database_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _worker_exporter.connect()
+
+
+def _build_space_folder_in_worker(airspace: dict) -> dict:
+    """Construit le dossier d'un espace dans un processus de travail (fragment XML texte)"""
+    return _worker_exporter._build_space_folder(airspace)
+
+
+def _get_worker_pool(database_path: str) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Retourne le pool de processus persistant, créé au premier export volumineux
+    
+    Args:
+        database_path: Base ouverte par chaque processus de travail
+        
+    Returns:
+        Pool de processus
+    """
+    global _worker_pool, _worker_pool_database
+    if _worker_pool is not None and _worker_pool_database != database_path:
+        _worker_pool.shutdown()
+        _worker_pool = None
+    if _worker_pool is None:
+        _worker_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(database_path,)
+        )
+        _worker_pool_database = database_path
+    return _worker_pool
+
 
 def launch_google_earth_pro(kml_file_path: str) -> bool:
     """
@@ -24,38 +139,37 @@ def launch_google_earth_pro(kml_file_path: str) -> bool:
     Returns:
         True si le lancement a réussi, False sinon
     """
-    # Emplacements possibles de Google Earth Pro
-    possible_paths = [
-        r"C:\Program Files\Google\Google Earth Pro\client\googleearth.exe",
-        r"C:\Program Files (x86)\Google\Google Earth Pro\client\googleearth.exe",
-        r"C:\Program Files\Google\Google Earth Pro\googleearth.exe",
-        r"C:\Program Files (x86)\Google\Google Earth Pro\googleearth.exe"
-    ]
+    # Vérifier que le fichier KML existe
+    if not os.path.isfile(kml_file_path):
+        print(f"❌ Fichier KML non trouvé: {kml_file_path}")
+        return False
     
     # Trouver Google Earth Pro
-    google_earth_path = None
-    for path in possible_paths:
-        if os.path.exists(path):
-            google_earth_path = path
-            break
-    
+    google_earth_path = _find_google_earth()
     if not google_earth_path:
         print("❌ Google Earth Pro non trouvé dans les emplacements habituels:")
-        for path in possible_paths:
+        for path in GOOGLE_EARTH_PATHS:
             print(f"   - {path}")
         print("   Veuillez vérifier l'installation de Google Earth Pro")
         return False
     
-    # Vérifier que le fichier KML existe
-    if not os.path.exists(kml_file_path):
-        print(f"❌ Fichier KML non trouvé: {kml_file_path}")
-        return False
-    
     try:
         # Lancer Google Earth Pro avec le fichier KML
         print(f"🚀 Lancement de Google Earth Pro avec: {kml_file_path}")
         print(f"   Utilisation de: {google_earth_path}")
-        subprocess.Popen([google_earth_path, kml_file_path], shell=False)
+        if sys.platform == 'win32':
+            # Processus détaché : pas d'héritage de handles ni de console à attendre
+            subprocess.Popen(
+                [google_earth_path, kml_file_path],
+                shell=False,
+                close_fds=False,
+                creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        else:
+            subprocess.Popen([google_earth_path, kml_file_path], shell=False)
         return True
     except Exception as e:
         print(f"❌ Erreur lors du lancement de Google Earth Pro: {e}")
@@ -294,12 +408,12 @@ class GoogleEarthExporter:
             print(f"❌ Erreur recherche espaces: {e}")
             return []
     
-    def _save_kml(self, kml_content: str, output_path: str) -> bool:
+    def _save_kml(self, kml_content, output_path: str) -> bool:
         """
         Sauvegarde le contenu KML dans un fichier
         
         Args:
-            kml_content: Contenu KML à sauvegarder
+            kml_content: Contenu KML à sauvegarder (str, ou bytes déjà encodés en UTF-8)
             output_path: Chemin de sortie
         
         Returns:
@@ -311,10 +425,14 @@ class GoogleEarthExporter:
             if output_dir:  # Seulement si le chemin contient un dossier
                 os.makedirs(output_dir, exist_ok=True)
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(kml_content)
+            if isinstance(kml_content, bytes):
+                with open(output_path, 'wb') as f:
+                    f.write(kml_content)
+            else:
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    f.write(kml_content)
             
-            file_size = len(kml_content.encode('utf-8'))
+            file_size = os.path.getsize(output_path)
             print(f"✅ KML sauvegardé: {output_path} ({file_size:,} octets)")
             return True
             
@@ -357,7 +475,8 @@ class GoogleEarthExporter:
     def export_with_filters(self, keyword: str = None, space_type: str = None, 
                            space_class: str = None, max_results: int = None,
                            case_sensitive: bool = False, output_path: str = None,
-                           force_regenerate: bool = False, altitude_max: int = None) -> bool:
+                           force_regenerate: bool = False, altitude_max: int = None,
+                           keyword_prefix: bool = False) -> bool:
         """
         Export avec filtrage avancé (similaire à list_entities.py)
         
@@ -370,6 +489,7 @@ class GoogleEarthExporter:
             output_path: Fichier de sortie
             force_regenerate: Force la régénération du cache
             altitude_max: Exclure les espaces dont le plancher est >= à cette altitude (pieds)
+            keyword_prefix: Le mot-clé doit être en début de lk (utilise l'index)
             
         Returns:
             True si succès, False sinon
@@ -388,18 +508,19 @@ class GoogleEarthExporter:
             """
             params = []
             
-            # Filtre par mot-clé
+            # Filtre par mot-clé (préfixe ancré : recherche par plage sur l'index NOCASE)
             if keyword:
+                pattern = f"{keyword}%" if keyword_prefix else f"%{keyword}%"
                 if case_sensitive:
                     query += " AND e.lk LIKE ?"
-                    params.append(f"%{keyword}%")
                 else:
-                    query += " AND LOWER(e.lk) LIKE LOWER(?)"
-                    params.append(f"%{keyword}%")
+                    query += " AND e.lk LIKE ? COLLATE NOCASE"
+                params.append(pattern)
             
-            # Filtre par type d'espace
+            # Filtre par type d'espace (paramétré : texte SQL stable pour le cache de requêtes)
             if space_type:
-                query += f" AND UPPER(e.lk) LIKE '%{space_type.upper()}%'"
+                query += " AND e.lk LIKE ? COLLATE NOCASE"
+                params.append(f"%{space_type}%")
             
             # Filtre par classe d'espace
             if space_class:
@@ -413,37 +534,38 @@ class GoogleEarthExporter:
                 params.append(space_class.upper())
             
             # Filtre par altitude maximale (exclure les espaces dont le plancher est >= altitude_max)
+            floors_ft = None
             if altitude_max:
-                query += """
-                AND (
-                    SELECT MIN(
-                        CASE 
-                            WHEN v.plancher_ref_unite LIKE '%FL%' AND v.plancher != 'SFC' AND v.plancher != 'GND'
-                            THEN CAST(v.plancher AS INTEGER) * 100
-                            WHEN v.plancher_ref_unite LIKE '%ft%' AND v.plancher != 'SFC' AND v.plancher != 'GND'
-                            THEN CAST(v.plancher AS INTEGER)
-                            WHEN v.plancher_ref_unite LIKE '%m%' AND v.plancher != 'SFC' AND v.plancher != 'GND'
-                            THEN CAST(v.plancher AS INTEGER) * 3.28084
-                            WHEN v.plancher = 'SFC' OR v.plancher = 'GND'
-                            THEN 0
-                            ELSE 0
-                        END
-                    )
-                    FROM volumes v
-                    JOIN parties p ON v.partie_ref = p.pk
-                    WHERE p.espace_ref = e.pk
-                ) < ?
-                """
-                params.append(altitude_max)
+                if self.extractor.has_column('volumes', 'plancher_ft'):
+                    # plancher_ft : colonne générée (pieds), indexée avec partie_ref
+                    query += """
+                    AND (
+                        SELECT MIN(v.plancher_ft)
+                        FROM volumes v
+                        JOIN parties p ON v.partie_ref = p.pk
+                        WHERE p.espace_ref = e.pk
+                    ) < ?
+                    """
+                    params.append(altitude_max)
+                else:
+                    # SQLite sans colonnes générées : planchers convertis en Python en une passe
+                    floors_ft = self.extractor.get_min_floor_ft_by_espace()
             
-            # Tri et limite
+            # Tri et limite (appliquée après le filtre d'altitude s'il est fait en Python)
             query += " ORDER BY e.lk"
-            if max_results:
-                query += f" LIMIT {max_results}"
+            if max_results and floors_ft is None:
+                query += " LIMIT ?"
+                params.append(max_results)
             
             cursor.execute(query, params)
             results = cursor.fetchall()
             
+            if floors_ft is not None:
+                results = [row for row in results
+                           if row[2] in floors_ft and floors_ft[row[2]] < altitude_max]
+                if max_results:
+                    results = results[:max_results]
+            
             if not results:
                 print("❌ Aucun espace trouvé avec les critères spécifiés")
                 return False
@@ -502,116 +624,93 @@ class GoogleEarthExporter:
     def _create_combined_kml(self, espace_lks: List[str], output_path: str, output_name: str) -> bool:
         """
         Crée un KML combiné avec l'extracteur amélioré
-        """
-        import xml.etree.ElementTree as ET
-        from xml.dom import minidom
         
+        Le document est écrit dans un fichier temporaire du même dossier, qui ne remplace
+        output_path qu'une fois complet (pas de KML tronqué en cas d'erreur).
+        """
+        temp_path = None
         try:
             print(f"🔄 Création du KML combiné avec {len(espace_lks)} espace(s)")
             
-            # Créer la structure KML de base
-            kml = ET.Element('kml')
-            kml.set('xmlns', 'http://www.opengis.net/kml/2.2')
-            
-            document = ET.SubElement(kml, 'Document')
-            
             # Nom et description du document
-            name = ET.SubElement(document, 'name')
+            name = ET.Element('name')
             name.text = output_name
             
-            description = ET.SubElement(document, 'description')
-            desc_text = f"""
-            Export combiné de {len(espace_lks)} espace(s) aérien(s)
-            Généré avec l'extracteur amélioré (parties visibles)
-            Espaces inclus:
-            """
-            for i, lk in enumerate(espace_lks, 1):
-                desc_text += f"\n  {i}. {lk}"
-            
-            description.text = desc_text.strip()
+            description = ET.Element('description')
+            desc_lines = [
+                f"Export combiné de {len(espace_lks)} espace(s) aérien(s)",
+                "Généré avec l'extracteur amélioré (parties visibles)",
+                "Espaces inclus:"
+            ]
+            desc_lines.extend(f"  {i}. {lk}" for i, lk in enumerate(espace_lks, 1))
+            description.text = '\n'.join(desc_lines)
             
-            # Organiser les espaces par type dans des dossiers
-            spaces_by_type = {}
+            # Toutes les lectures de l'export dans une seule transaction
+            with self.extractor.read_transaction():
+                # Identifiants des styles déjà ajoutés au document
+                emitted_styles = set()
             
-            # Grouper les espaces par type
-            for espace_lk in espace_lks:
-                print(f"   📋 Traitement de {espace_lk}...")
-                
-                try:
-                    # Récupérer l'espace
-                    airspace = self.extractor.get_airspace_by_lk(espace_lk)
-                    if not airspace:
+                # Espaces récupérés en une requête, déjà triés par type (un dossier par groupe)
+                airspaces = self.extractor.get_airspaces_by_lks(espace_lks)
+                found_lks = {airspace['lk'] for airspace in airspaces}
+                for espace_lk in espace_lks:
+                    if espace_lk not in found_lks:
                         print(f"      ⚠️ Espace non trouvé: {espace_lk}")
-                        continue
-                    
-                    # Récupérer les parties
-                    parts = self.extractor.get_parts_for_airspace(airspace['pk'])
-                    if not parts:
-                        print(f"      ⚠️ Aucune partie trouvée pour: {espace_lk}")
-                        continue
-                    
-                    # Grouper par type
-                    space_type = airspace['type_espace']
-                    if space_type not in spaces_by_type:
-                        spaces_by_type[space_type] = []
-                    
-                    spaces_by_type[space_type].append({
-                        'airspace': airspace,
-                        'parts': parts
-                    })
-                    
-                    print(f"      ✅ {len(parts)} partie(s) trouvée(s) - Type: {space_type}")
-                    
-                except Exception as e:
-                    print(f"      ❌ Erreur traitement {espace_lk}: {str(e)[:50]}...")
-                    continue
             
-            # Créer les dossiers par type et ajouter les espaces
-            for space_type in sorted(spaces_by_type.keys()):
-                spaces_list = spaces_by_type[space_type]
-                
-                print(f"   📁 Création dossier type: {space_type} ({len(spaces_list)} espace(s))")
+                # Écriture en flux : chaque dossier type est sérialisé dès qu'il est complet
+                temp_path = f"{output_path}.{os.getpid()}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write("<?xml version='1.0' encoding='utf-8'?>\n")
+                    f.write('<kml xmlns="http://www.opengis.net/kml/2.2">\n  <Document>')
+                    self._write_document_child(f, name)
+                    self._write_document_child(f, description)
+                    writer = KMLStreamWriter(f)
                 
-                # Créer un dossier pour ce type d'espace
-                type_folder = ET.SubElement(document, 'Folder')
-                type_folder_name = ET.SubElement(type_folder, 'name')
-                type_folder_name.text = f"{space_type} ({len(spaces_list)})"
-                
-                # Description du dossier type
-                type_folder_description = ET.SubElement(type_folder, 'description')
-                type_folder_description.text = f"Espaces de type {space_type} - {len(spaces_list)} espace(s)"
-                
-                # Ajouter chaque espace dans ce dossier type
-                for space_info in spaces_list:
-                    airspace = space_info['airspace']
-                    parts = space_info['parts']
-                    
-                    # Ajouter les styles spécifiques à cet espace
-                    self._add_space_specific_styles(document, airspace, parts)
+                    for space_type, group in itertools.groupby(airspaces, key=lambda a: a['type_espace']):
+                        spaces_list = []
+                        for space_info in self._map_space_folders(group, len(airspaces)):
+                            espace_lk = space_info['airspace']['lk']
+                            print(f"   📋 Traitement de {espace_lk}...")
+                            if space_info.get('error'):
+                                print(f"      ❌ Erreur traitement {espace_lk}: {space_info['error'][:50]}...")
+                            elif space_info['folder'] is None:
+                                print(f"      ⚠️ Aucune partie trouvée pour: {espace_lk}")
+                            else:
+                                spaces_list.append(space_info)
+                                print(f"      ✅ {space_info['parts_count']} partie(s) trouvée(s) - Type: {space_type}")
+                        
+                        if not spaces_list:
+                            continue
+                        
+                        print(f"   📁 Création dossier type: {space_type} ({len(spaces_list)} espace(s))")
+                        
+                        # Dossier de ce type d'espace écrit en flux (styles de ses espaces à la suite)
+                        type_styles = ET.Element('Document')
+                        writer.start('Folder', 2)
+                        writer.text_element('name', f"{space_type} ({len(spaces_list)})", 3)
+                        writer.text_element('description', f"Espaces de type {space_type} - {len(spaces_list)} espace(s)", 3)
+                        
+                        # Ajouter chaque espace dans ce dossier type
+                        for space_info in spaces_list:
+                            # Ajouter les styles spécifiques à cet espace
+                            self._add_space_specific_styles(type_styles, space_info['airspace'],
+                                                            space_info['classe_dominante'],
+                                                            space_info['base_color'], emitted_styles)
+                            
+                            # Dossier de l'espace déjà sérialisé (aucun arbre ElementTree)
+                            f.write(space_info['folder'])
+                        
+                        writer.end('Folder', 2)
+                        for style in type_styles:
+                            self._write_document_child(f, style)
                     
-                    # Créer un dossier pour cet espace dans le dossier type
-                    space_folder = ET.SubElement(type_folder, 'Folder')
-                    space_folder_name = ET.SubElement(space_folder, 'name')
-                    space_folder_name.text = airspace['nom']  # Nom lisible plutôt que LK
-                    
-                    # Description de l'espace
-                    space_folder_description = ET.SubElement(space_folder, 'description')
-                    space_folder_description.text = f"Espace: {airspace['lk']}\nType: {airspace['type_espace']}\nNombre de parties: {len(parts)}"
-                    
-                    # Ajouter chaque partie avec le bon style
-                    for part in parts:
-                        self._add_part_to_folder_with_colors(space_folder, part, airspace)
-            
-            # Convertir en chaîne XML formatée
-            rough_string = ET.tostring(kml, encoding='unicode')
-            reparsed = minidom.parseString(rough_string)
-            kml_content = reparsed.toprettyxml(indent='  ')
+                    f.write('\n  </Document>\n</kml>')
             
-            # Sauvegarder
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(kml_content)
+            # Remplacement atomique (même système de fichiers)
+            os.replace(temp_path, output_path)
+            temp_path = None
             
-            file_size = len(kml_content.encode('utf-8'))
+            file_size = os.path.getsize(output_path)
             print(f"✅ KML combiné sauvegardé: {output_path} ({file_size:,} octets)")
             
             return True
@@ -619,44 +718,134 @@ class GoogleEarthExporter:
         except Exception as e:
             print(f"❌ Erreur création KML combiné: {e}")
             return False
+        
+        finally:
+            # Fichier temporaire d'un export interrompu : fichier existant conservé intact
+            if temp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
     
-    def _add_space_specific_styles(self, document, airspace, parts):
-        """Ajoute les styles spécifiques à un espace avec les bonnes couleurs"""
-        import xml.etree.ElementTree as ET
-        from color_service import get_space_color
+    def _map_space_folders(self, airspaces: Iterable[Dict], total_count: int):
+        """
+        Construit les dossiers d'une suite d'espaces, en parallèle si l'export est volumineux
         
-        # Déterminer la couleur pour ce type d'espace
-        type_espace = airspace['type_espace']
+        Args:
+            airspaces: Espaces d'un même type (itérable consommé en flux en série)
+            total_count: Nombre total d'espaces de l'export (seuil de parallélisation)
+            
+        Returns:
+            Itérateur des résultats de _build_space_folder, dans l'ordre des espaces
+        """
+        if total_count < PARALLEL_MIN_SPACES:
+            return map(self._build_space_folder, airspaces)
         
-        # Trouver une classe représentative - privilégier la classe A
-        classe = None
-        classes_found = set()
-        for part in parts:
-            for volume in part['volumes']:
-                if volume['classe']:
-                    classes_found.add(volume['classe'])
+        # Le découpage en lots du pool a besoin de la taille du groupe
+        airspaces = list(airspaces)
+        if len(airspaces) < 2:
+            return map(self._build_space_folder, airspaces)
         
-        # Ordre de priorité : A > B > C > D > E > autres
-        priority_order = ['A', 'B', 'C', 'D', 'E']
-        for priority_class in priority_order:
-            if priority_class in classes_found:
-                classe = priority_class
-                break
+        pool = _get_worker_pool(self.database_path)
+        chunksize = max(1, len(airspaces) // (4 * (os.cpu_count() or 1)))
+        return pool.map(_build_space_folder_in_worker, airspaces, chunksize=chunksize)
+    
+    def _build_space_folder(self, airspace: Dict) -> Dict:
+        """
+        Construit le dossier KML d'un espace avec toutes ses parties
         
-        # Si aucune classe prioritaire, prendre la première trouvée
-        if not classe and classes_found:
-            classe = list(classes_found)[0]
+        Args:
+            airspace: Informations de l'espace
+            
+        Returns:
+            Dictionnaire avec 'airspace', 'parts_count', 'base_color', 'classe_dominante'
+            et 'folder' (texte XML indenté au niveau 3, None si l'espace n'a aucune partie),
+            ou 'error' en cas d'échec
+        """
+        space_info = {'airspace': airspace, 'folder': None}
+        try:
+            # Récupérer les parties
+            parts = self.extractor.get_parts_for_airspace(airspace['pk'])
+            if not parts:
+                return space_info
+            
+            # Couleur de base et classe dominante calculées une fois par espace
+            classe_dominante = self._get_dominant_class(parts)
+            space_info['parts_count'] = len(parts)
+            space_info['classe_dominante'] = classe_dominante
+            space_info['base_color'] = get_space_color(airspace['type_espace'], classe_dominante, 'kml')
+            
+            # Dossier de l'espace écrit directement en texte (dans le dossier type, niveau 3)
+            buffer = io.StringIO()
+            writer = KMLStreamWriter(buffer)
+            writer.start('Folder', 3)
+            writer.text_element('name', airspace['nom'], 4)  # Nom lisible plutôt que LK
+            
+            # Description de l'espace
+            writer.text_element('description', f"Espace: {airspace['lk']}\nType: {airspace['type_espace']}\nNombre de parties: {len(parts)}", 4)
+            
+            # Ajouter chaque partie avec le bon style
+            for part in parts:
+                self._write_part_placemark(writer, part, airspace, classe_dominante, 4)
+            
+            writer.end('Folder', 3)
+            space_info['folder'] = buffer.getvalue()
+            
+        except Exception as e:
+            space_info['error'] = str(e)
         
-        # Obtenir la couleur spécifique
-        base_color = get_space_color(type_espace, classe, 'kml')
+        return space_info
+    
+    def _write_document_child(self, f, element) -> None:
+        """
+        Écrit un enfant de <Document> indenté comme ET.indent le ferait sur l'arbre complet
         
-        # Style unique pour cet espace
-        style_id = f'volumeStyle_{airspace["pk"]}'
+        Args:
+            f: Fichier KML ouvert en écriture
+            element: Element à sérialiser (niveau 2 : kml > Document > element)
+        """
+        ET.indent(element, space='  ', level=2)
+        element.tail = None
+        f.write('\n    ' + ET.tostring(element, encoding='unicode'))
+    
+    def _get_dominant_class(self, parts) -> Optional[str]:
+        """
+        Détermine la classe représentative d'un espace - privilégier la classe A
+        
+        Args:
+            parts: Parties de l'espace avec leurs volumes
+            
+        Returns:
+            Classe dominante ou None si aucun volume n'est classé
+        """
+        classes_found = {v['classe'] for part in parts for v in part['volumes'] if v['classe']}
+        return self._pick_dominant_class(classes_found)
+    
+    def _pick_dominant_class(self, classes: set) -> Optional[str]:
+        """Ordre de priorité : A > B > C > D > E, sinon la première classe trouvée"""
+        return next((c for c in 'ABCDE' if c in classes), next(iter(classes), None))
+    
+    def _space_style_id(self, type_espace: str, classe_dominante: Optional[str]) -> str:
+        """Identifiant du style partagé par les espaces de même type et même classe dominante"""
+        return f"volumeStyle_{type_espace}_{classe_dominante or 'X'}"
+    
+    def _add_space_specific_styles(self, document, airspace, classe_dominante: Optional[str],
+                                   base_color: str, emitted_styles: set):
+        """
+        Ajoute le style d'un espace avec les bonnes couleurs (une fois par type et classe dominante)
+        
+        Args:
+            document: Element Document du KML
+            airspace: Informations de l'espace
+            classe_dominante: Classe dominante de l'espace
+            base_color: Couleur KML de l'espace (type et classe dominante)
+            emitted_styles: Identifiants des styles déjà présents dans le document (mis à jour)
+        """
+        # La couleur ne dépend que du type et de la classe : style partagé entre espaces
+        style_id = self._space_style_id(airspace['type_espace'], classe_dominante)
         
         # Vérifier si le style existe déjà
-        existing_style = document.find(f'.//Style[@id="{style_id}"]')
-        if existing_style is not None:
+        if style_id in emitted_styles:
             return  # Style déjà ajouté
+        emitted_styles.add(style_id)
         
         # Style principal pour les volumes extrudés
         main_style = ET.SubElement(document, 'Style')
@@ -676,15 +865,22 @@ class GoogleEarthExporter:
         poly_outline = ET.SubElement(poly_style, 'outline')
         poly_outline.text = '1'
     
-    def _add_part_to_folder_with_colors(self, parent_folder, part, airspace):
-        """Ajoute une partie d'espace au dossier parent avec les bonnes couleurs"""
-        import xml.etree.ElementTree as ET
-        import re
+    def _part_placemark_content(self, part, airspace, classe_dominante: Optional[str] = None):
+        """
+        Calcule le contenu du placemark d'une partie
         
+        Args:
+            part: Partie à ajouter
+            airspace: Informations de l'espace
+            classe_dominante: Classe dominante de l'espace entier (calculée une fois par espace)
+            
+        Returns:
+            Tuple (coordonnées, plancher, plafond, description, id de style), None sans contour
+        """
         coordinates = self._parse_contour_coordinates(part['contour'])
         
         if not coordinates:
-            return
+            return None
         
         # S'assurer que le polygone est fermé
         if coordinates and coordinates[0] != coordinates[-1]:
@@ -693,44 +889,22 @@ class GoogleEarthExporter:
         # Calculer les altitudes
         min_floor, max_ceiling = self._get_part_altitude_range(part)
         
-        # Créer directement un placemark avec le lk de la partie (structure simplifiée)
-        volume_placemark = ET.SubElement(parent_folder, 'Placemark')
-        volume_name = ET.SubElement(volume_placemark, 'name')
-        volume_name.text = part['lk']  # Utiliser directement le lk de la partie
-        
-        # Ajouter une description enrichie pour le mouse over
-        volume_description = ET.SubElement(volume_placemark, 'description')
+        # Description enrichie pour le mouse over
         part_name = part['nom_partie'] if part['nom_partie'] and part['nom_partie'] != '.' else f"Partie {part['numero_partie'] or 'principale'}"
         
         # Convertir les altitudes en pieds pour l'affichage (standard aéronautique)
-        min_floor_ft = int(min_floor * 3.28084)  # mètres vers pieds
-        max_ceiling_ft = int(max_ceiling * 3.28084)
+        min_floor_ft = int(min_floor * FT_PER_M)
+        max_ceiling_ft = int(max_ceiling * FT_PER_M)
         
         # Récupérer les classes des volumes de cette partie
-        volume_classes = set()
-        for volume in part['volumes']:
-            if volume['classe']:
-                volume_classes.add(volume['classe'])
+        volume_classes = {v['classe'] for v in part['volumes'] if v['classe']}
         
         classes_text = ', '.join(sorted(volume_classes)) if volume_classes else 'Non spécifiée'
         type_espace = airspace['type_espace']
         
-        # Déterminer la classe dominante de l'espace entier (pour cohérence)
-        espace_classes = set()
-        for p in [part]:  # On pourrait passer toutes les parties, mais on a seulement celle-ci ici
-            for vol in p['volumes']:
-                if vol['classe']:
-                    espace_classes.add(vol['classe'])
-        
-        # Classe dominante (privilégier A)
-        classe_dominante = None
-        priority_order = ['A', 'B', 'C', 'D', 'E']
-        for priority_class in priority_order:
-            if priority_class in espace_classes:
-                classe_dominante = priority_class
-                break
-        if not classe_dominante and espace_classes:
-            classe_dominante = list(espace_classes)[0]
+        # Sans classe de l'espace entier (appel legacy), se limiter à cette partie
+        if classe_dominante is None:
+            classe_dominante = self._pick_dominant_class(volume_classes)
         
         desc_lines = [
             f"Espace: {type_espace} (classe dominante: {classe_dominante or 'N/A'})",
@@ -739,262 +913,66 @@ class GoogleEarthExporter:
             f"Plancher: {min_floor_ft} ft ({min_floor:.0f} m)",
             f"Plafond: {max_ceiling_ft} ft ({max_ceiling:.0f} m)"
         ]
-        volume_description.text = '\n'.join(desc_lines)
+        description = '\n'.join(desc_lines)
+        style_id = self._space_style_id(type_espace, classe_dominante)
         
-        # Référencer le style spécifique à cet espace
-        volume_style_url = ET.SubElement(volume_placemark, 'styleUrl')
-        volume_style_url.text = f'#volumeStyle_{airspace["pk"]}'
+        return coordinates, min_floor, max_ceiling, description, style_id
+    
+    def _write_part_placemark(self, writer: KMLStreamWriter, part, airspace,
+                              classe_dominante: Optional[str], level: int) -> None:
+        """
+        Écrit le placemark d'une partie (nom = lk, style de l'espace, géométrie 3D) dans un flux
         
-        # Utiliser la géométrie 3D complète (plancher + plafond + murs)
-        self._create_multigeometry_3d(volume_placemark, coordinates, min_floor, max_ceiling)
+        Args:
+            writer: Flux KML
+            part: Partie à écrire
+            airspace: Informations de l'espace
+            classe_dominante: Classe dominante de l'espace entier
+            level: Profondeur du Placemark dans le document
+        """
+        content = self._part_placemark_content(part, airspace, classe_dominante)
+        if content is None:
+            return
+        coordinates, min_floor, max_ceiling, description, style_id = content
+        
+        writer.start('Placemark', level)
+        writer.text_element('name', part['lk'], level + 1)
+        writer.text_element('description', description, level + 1)
+        writer.text_element('styleUrl', f"#{style_id}", level + 1)
+        self._write_multigeometry_3d(writer, coordinates, min_floor, max_ceiling, level + 1)
+        writer.end('Placemark', level)
     
-    def _create_multigeometry_3d(self, parent_element, coordinates, min_floor, max_ceiling):
+    def _write_multigeometry_3d(self, writer: KMLStreamWriter, coordinates, min_floor, max_ceiling,
+                                level: int) -> None:
         """
-        Crée une géométrie 3D complète (plancher + plafond + murs) sous un élément parent
+        Écrit une géométrie 3D complète (plancher + plafond + murs) dans un flux
         
         Args:
-            parent_element: Element XML parent où ajouter la MultiGeometry
+            writer: Flux KML
             coordinates: Liste de tuples (lat, lon) définissant le contour
             min_floor: Altitude du plancher en mètres
             max_ceiling: Altitude du plafond en mètres
+            level: Profondeur de la MultiGeometry dans le document
         """
-        import xml.etree.ElementTree as ET
-        
-        # Géométrie 3D complète (plancher + plafond + murs)
-        multi_geometry = ET.SubElement(parent_element, 'MultiGeometry')
-        
-        # 1. Polygone plancher
-        floor_polygon = ET.SubElement(multi_geometry, 'Polygon')
-        floor_altitude_mode = ET.SubElement(floor_polygon, 'altitudeMode')
-        floor_altitude_mode.text = 'absolute'
-        floor_outer = ET.SubElement(floor_polygon, 'outerBoundaryIs')
-        floor_ring = ET.SubElement(floor_outer, 'LinearRing')
-        floor_coords = ET.SubElement(floor_ring, 'coordinates')
-        
-        # Coordonnées plancher (sens horaire pour face vers le bas)
-        floor_coord_strings = []
-        for lat, lon in reversed(coordinates):  # Inverser pour orientation correcte
-            floor_coord_strings.append(f"{lon},{lat},{min_floor}")
-        floor_coords.text = ' '.join(floor_coord_strings)
-        
-        # 2. Polygone plafond  
-        ceiling_polygon = ET.SubElement(multi_geometry, 'Polygon')
-        ceiling_altitude_mode = ET.SubElement(ceiling_polygon, 'altitudeMode')
-        ceiling_altitude_mode.text = 'absolute'
-        ceiling_outer = ET.SubElement(ceiling_polygon, 'outerBoundaryIs')
-        ceiling_ring = ET.SubElement(ceiling_outer, 'LinearRing')
-        ceiling_coords = ET.SubElement(ceiling_ring, 'coordinates')
-        
-        # Coordonnées plafond (sens antihoraire pour face vers le haut)
-        ceiling_coord_strings = []
-        for lat, lon in coordinates:
-            ceiling_coord_strings.append(f"{lon},{lat},{max_ceiling}")
-        ceiling_coords.text = ' '.join(ceiling_coord_strings)
-        
-        # 3. Murs (un polygone vertical par segment)
-        for i in range(len(coordinates) - 1):  # -1 car dernier point = premier
-            lat1, lon1 = coordinates[i]
-            lat2, lon2 = coordinates[i + 1]
-            
-            # Créer un polygone vertical pour ce segment
-            wall_polygon = ET.SubElement(multi_geometry, 'Polygon')
-            wall_altitude_mode = ET.SubElement(wall_polygon, 'altitudeMode')
-            wall_altitude_mode.text = 'absolute'
-            wall_outer = ET.SubElement(wall_polygon, 'outerBoundaryIs')
-            wall_ring = ET.SubElement(wall_outer, 'LinearRing')
-            wall_coords = ET.SubElement(wall_ring, 'coordinates')
-            
-            # Rectangle vertical : bas1 -> haut1 -> haut2 -> bas2 -> bas1
-            wall_coord_strings = [
-                f"{lon1},{lat1},{min_floor}",      # Point 1 plancher
-                f"{lon1},{lat1},{max_ceiling}",    # Point 1 plafond
-                f"{lon2},{lat2},{max_ceiling}",    # Point 2 plafond
-                f"{lon2},{lat2},{min_floor}",      # Point 2 plancher
-                f"{lon1},{lat1},{min_floor}"       # Fermeture
-            ]
-            wall_coords.text = ' '.join(wall_coord_strings)
-        
-        return multi_geometry
-
-    def _add_part_to_folder(self, parent_folder, part, airspace):
-        """Méthode legacy - utilise la nouvelle méthode avec couleurs"""
-        return self._add_part_to_folder_with_colors(parent_folder, part, airspace)
+        writer.start('MultiGeometry', level)
+        for ring in self.extractor.multigeometry_3d_rings(coordinates, min_floor, max_ceiling):
+            writer.start('Polygon', level + 1)
+            writer.text_element('altitudeMode', 'absolute', level + 2)
+            writer.start('outerBoundaryIs', level + 2)
+            writer.start('LinearRing', level + 3)
+            writer.text_element('coordinates', ring, level + 4)
+            writer.end('LinearRing', level + 3)
+            writer.end('outerBoundaryIs', level + 2)
+            writer.end('Polygon', level + 1)
+        writer.end('MultiGeometry', level)
     
     def _parse_contour_coordinates(self, contour: str):
-        """Parse les coordonnées depuis le champ 'contour'"""
-        import re
-        import math
-        
-        coordinates = []
-        
-        if not contour:
-            return coordinates
-        
-        lines = contour.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Vérifier s'il y a une définition de cercle
-            circle_pattern = r'cir\(([-+]?\d+\.?\d*)\s+([-+]?\d+\.?\d*):(\d+\.?\d*):([A-Z]+)'
-            circle_match = re.search(circle_pattern, line)
-            
-            if circle_match:
-                # C'est un cercle - générer des points sur le périmètre
-                center_lat = float(circle_match.group(1))
-                center_lon = float(circle_match.group(2))
-                radius = float(circle_match.group(3))
-                unit = circle_match.group(4)
-                
-                # Convertir le rayon en degrés (approximation)
-                if unit == 'NM':  # Nautical Miles
-                    radius_deg = radius / 60.0  # 1 degré ≈ 60 NM
-                elif unit == 'KM':
-                    radius_deg = radius / 111.0  # 1 degré ≈ 111 km
-                elif unit == 'M':
-                    radius_deg = radius / 111000.0  # 1 degré ≈ 111000 m
-                else:
-                    radius_deg = radius / 60.0  # Par défaut, supposer NM
-                
-                # Générer 36 points sur le cercle (tous les 10 degrés)
-                num_points = 36
-                for i in range(num_points + 1):  # +1 pour fermer le cercle
-                    angle = (i * 2 * math.pi) / num_points
-                    
-                    # Approximation simple (valable pour les petites distances)
-                    lat = center_lat + radius_deg * math.cos(angle)
-                    lon = center_lon + radius_deg * math.sin(angle) / math.cos(math.radians(center_lat))
-                    
-                    coordinates.append((lat, lon))
-                
-                print(f"   🔵 Cercle détecté: centre({center_lat:.3f}, {center_lon:.3f}), rayon {radius} {unit} → {len(coordinates)} points")
-                return coordinates
-            
-            # Sinon, parser les coordonnées classiques
-            coord_pattern = r'(\d+\.?\d*)\s+(\d+\.?\d*)'
-            matches = re.findall(coord_pattern, line)
-            
-            for match in matches:
-                try:
-                    lat = float(match[0])
-                    lon = float(match[1])
-                    if 40 <= lat <= 55 and -10 <= lon <= 10:
-                        coordinates.append((lat, lon))
-                        break
-                except ValueError:
-                    continue
-        
-        return coordinates
+        """Parse les coordonnées depuis le champ 'contour' (voir extractor.parse_contour)"""
+        return list(parse_contour(contour))
     
-    def _estimate_surface_elevation(self, contour: str) -> float:
-        """
-        Estime l'élévation de surface basée sur la géométrie de l'espace
-        Approximation basée sur des données connues pour les régions françaises
-        """
-        if not contour:
-            return 0.0
-        
-        # Extraire les coordonnées pour estimer la région
-        coordinates = self._parse_contour_coordinates(contour)
-        if not coordinates:
-            return 0.0
-        
-        # Calculer le centre approximatif
-        center_lat = sum(coord[0] for coord in coordinates) / len(coordinates)
-        center_lon = sum(coord[1] for coord in coordinates) / len(coordinates)
-        
-        # Approximations basées sur les régions françaises
-        # Limoges area (45.8°N, 1.2°E) : ~350m
-        if 45.5 <= center_lat <= 46.2 and 0.8 <= center_lon <= 1.8:
-            return 350.0
-        
-        # Paris area (48.8°N, 2.3°E) : ~100m
-        elif 48.3 <= center_lat <= 49.3 and 1.8 <= center_lon <= 2.8:
-            return 100.0
-        
-        # Bourget area (proche Paris) : ~60m
-        elif 48.8 <= center_lat <= 49.0 and 2.3 <= center_lon <= 2.6:
-            return 60.0
-        
-        # France métropolitaine générale : ~200m (moyenne)
-        elif 42.0 <= center_lat <= 52.0 and -5.0 <= center_lon <= 10.0:
-            return 200.0
-        
-        # Défaut
-        return 0.0
-
     def _get_part_altitude_range(self, part):
-        """Calcule la plage d'altitude pour une partie"""
-        if not part['volumes']:
-            return 0.0, 1000.0
-        
-        # Estimer l'élévation de surface basée sur la géométrie
-        surface_elevation = self._estimate_surface_elevation(part.get('contour', ''))
-        min_floor = float('inf')
-        max_ceiling = float('-inf')
-        
-        for volume in part['volumes']:
-            floor_alt = self._parse_altitude_to_meters(
-                volume['plancher'], 
-                volume['plancher_ref_unite'], 
-                is_ceiling=False, 
-                surface_elevation=surface_elevation
-            )
-            ceiling_alt = self._parse_altitude_to_meters(
-                volume['plafond'], 
-                volume['plafond_ref_unite'], 
-                is_ceiling=True, 
-                surface_elevation=surface_elevation
-            )
-            
-            min_floor = min(min_floor, floor_alt)
-            max_ceiling = max(max_ceiling, ceiling_alt)
-        
-        return min_floor if min_floor != float('inf') else 0.0, max_ceiling if max_ceiling != float('-inf') else 1000.0
-    
-    def _parse_altitude_to_meters(self, altitude: str, ref_unite: str, is_ceiling: bool = True, surface_elevation: float = 0.0) -> float:
-        """Convertit une altitude en mètres"""
-        import re
-        
-        if not ref_unite:
-            return 0.0
-        
-        try:
-            if ref_unite == "SFC":
-                return surface_elevation
-            elif ref_unite == "UNL":
-                if is_ceiling:
-                    return 19500 * 0.3048
-                else:
-                    return 18000 * 0.3048
-            
-            if isinstance(altitude, str):
-                altitude_clean = re.sub(r'[^\d.]', '', altitude)
-                if not altitude_clean:
-                    return 0.0
-                altitude_val = float(altitude_clean)
-            else:
-                altitude_val = float(altitude)
-            
-            if ref_unite.startswith("FL"):
-                return altitude_val * 100 * 0.3048
-            elif "ft" in ref_unite.lower():
-                if "ASFC" in ref_unite:
-                    return surface_elevation + (altitude_val * 0.3048)
-                else:
-                    return altitude_val * 0.3048
-            elif "m" in ref_unite.lower():
-                if "ASFC" in ref_unite:
-                    return surface_elevation + altitude_val
-                else:
-                    return altitude_val
-            else:
-                return altitude_val * 0.3048
-                
-        except (ValueError, TypeError):
-            return 0.0
+        """Calcule la plage d'altitude pour une partie (voir extractor.part_altitude_range)"""
+        return part_altitude_range(part)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -1069,6 +1047,8 @@ python google_earth_export.py --stats
                        help='Nombre maximum d\'espaces à exporter')
     parser.add_argument('--case-sensitive', '-c', action='store_true',
                        help='Recherche sensible à la casse')
+    parser.add_argument('--keyword-prefix', action='store_true',
+                       help='Le mot-clé doit figurer en début d\'identifiant lk (ex: "[LF][TMA")')
     
     # Options communes
     parser.add_argument('--output', type=str,
@@ -1136,7 +1116,8 @@ python google_earth_export.py --stats
                 case_sensitive=args.case_sensitive,
                 output_path=args.output,
                 force_regenerate=args.force,
-                altitude_max=args.altitude
+                altitude_max=args.altitude,
+                keyword_prefix=args.keyword_prefix
             )
             
         elif args.single:
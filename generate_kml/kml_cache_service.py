@@ -5,26 +5,396 @@ Optimise les performances en cachant les KML générés par volume
 """
 
 import sqlite3
+import concurrent.futures
 import hashlib
+import logging
 import os
-from typing import List, Dict, Optional, Tuple
+import queue
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from datetime import datetime
 
+# xxHash (XXH3) optionnel : empreinte non cryptographique plus rapide que SHA-256
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Zstandard optionnel pour compresser les KML stockés, sinon zlib (bibliothèque standard)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Erreurs du service journalisées (formatage différé, ignoré si le niveau est désactivé)
+logger = logging.getLogger(__name__)
+
+# Réglages appliqués à la connexion du cache (écritures fréquentes, lectures par jointures)
+CACHE_SIZE_KIB = -64000  # ~64 Mo de cache de pages
+CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA cache_size={CACHE_SIZE_KIB}",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA mmap_size=268435456",     # 256 Mo en mémoire mappée
+]
+# Persistant dans le fichier : appliqué par la connexion d'écriture ouverte par le
+# service uniquement (jamais à une connexion fournie par l'appelant)
+WAL_PRAGMA = "PRAGMA journal_mode=WAL"
+
+# Pool de lecture (service créé sur un chemin) : taille fixe, chaque connexion pouvant
+# occuper jusqu'au cache de pages et à la mémoire mappée ci-dessus. Au-delà du délai
+# d'attente, la lecture passe par une connexion ouverte pour l'occasion
+READER_POOL_SIZE = 4
+READER_CHECKOUT_TIMEOUT = 0.5  # secondes
+
+# Index des jointures kml_cache -> volumes -> parties par espace (kml_cache.volume_ref
+# est déjà indexé par sa contrainte UNIQUE)
+CACHE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_parties_espace ON parties(espace_ref)",
+    "CREATE INDEX IF NOT EXISTS idx_volumes_partie_sequence ON volumes(partie_ref, sequence)",
+    # Index d'expression : mêmes expressions que les filtres d'altitude de
+    # iter_cached_volumes_by_criteria (recherche par intervalle au lieu d'un CAST par ligne)
+    "CREATE INDEX IF NOT EXISTS idx_volumes_plancher_int ON volumes(CAST(plancher AS INTEGER))",
+    "CREATE INDEX IF NOT EXISTS idx_volumes_plafond_int ON volumes(CAST(plafond AS INTEGER))",
+]
+
+# Requêtes ponctuelles fréquentes : texte SQL constant, donc toujours retrouvé dans le
+# cache de requêtes préparées de la connexion (pas de nouvelle compilation par appel)
+GET_VOLUME_SQL = 'SELECT kml_content, compression FROM kml_cache WHERE volume_ref = ?'
+IS_VOLUME_CACHED_SQL = 'SELECT 1 FROM kml_cache WHERE volume_ref = ?'
+# Upsert : une ligne dont l'empreinte et la compression n'ont pas changé n'est pas
+# réécrite (une ligne illisible ici, zstd sans zstandard par exemple, est recompressée ;
+# IS NOT : compression NULL des entrées non compressées)
+STORE_VOLUME_SQL = (
+    'INSERT INTO kml_cache (volume_ref, kml_content, compression, content_hash) '
+    'VALUES (?, ?, ?, ?) '
+    'ON CONFLICT(volume_ref) DO UPDATE SET '
+    'kml_content = excluded.kml_content, compression = excluded.compression, '
+    'content_hash = excluded.content_hash, generated_at = CURRENT_TIMESTAMP '
+    'WHERE content_hash <> excluded.content_hash '
+    'OR compression IS NOT excluded.compression'
+)
+INVALIDATE_VOLUME_SQL = 'DELETE FROM kml_cache WHERE volume_ref = ?'
+
+# Recherche par critères : 16 formes de requête possibles (un bit par filtre renseigné),
+# chacune générée une seule fois puis réutilisée telle quelle (même texte SQL, donc
+# requête préparée retrouvée par la connexion)
+CRITERIA_BASE_SQL = '''
+    SELECT v.pk, kc.kml_content, kc.compression, v.lk, v.classe, v.plafond, v.plancher,
+           e.nom as espace_nom, e.type_espace
+    FROM kml_cache kc
+    JOIN volumes v ON kc.volume_ref = v.pk
+    JOIN parties p ON v.partie_ref = p.pk
+    JOIN espaces e ON p.espace_ref = e.pk
+'''
+CRITERIA_CLASSE = 1
+CRITERIA_ESPACE_TYPE = 2
+CRITERIA_ALTITUDE_MIN = 4
+CRITERIA_ALTITUDE_MAX = 8
+CRITERIA_CONDITIONS = [
+    (CRITERIA_CLASSE, 'v.classe = ?'),
+    (CRITERIA_ESPACE_TYPE, 'e.type_espace LIKE ?'),
+    (CRITERIA_ALTITUDE_MIN, 'CAST(v.plancher AS INTEGER) >= ?'),
+    (CRITERIA_ALTITUDE_MAX, 'CAST(v.plafond AS INTEGER) <= ?'),
+]
+
+# Tables dont les statistiques du planificateur (sqlite_stat1) sont recalculées par optimize()
+ANALYZE_TABLES = ['kml_cache', 'volumes', 'parties', 'espaces']
+
+# Mémo en processus (LRU) devant les lectures ponctuelles : présence et contenu par volume
+MEMO_PRESENCE_SIZE = 4096
+MEMO_CONTENT_SIZE = 256
+
+# Compression des KML stockés (XML très redondant : moins de pages lues et écrites)
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 3
+
+# Nombre de volumes à partir duquel un lot est encodé (empreinte + compression) par un
+# pool de threads : hashlib, zlib et zstandard relâchent le GIL sur les gros tampons
+PARALLEL_MIN_ITEMS = 32
+
+def _as_bytes(kml_content: Union[str, bytes]) -> bytes:
+    """Contenu KML en octets UTF-8 (entrées texte antérieures au stockage binaire)"""
+    return kml_content.encode('utf-8') if isinstance(kml_content, str) else kml_content
+
+def _compress(kml_bytes: bytes) -> Tuple[bytes, str]:
+    """
+    Compresse un contenu KML pour le stockage
+    
+    Returns:
+        Tuple (données compressées, algorithme pour la colonne compression)
+    """
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(kml_bytes), 'zstd'
+    return zlib.compress(kml_bytes, ZLIB_LEVEL), 'zlib'
+
+# Erreurs de décodage d'une entrée : traitée comme absente du cache
+DECOMPRESS_ERRORS = (ValueError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+def _decompress(kml_content: Union[str, bytes], compression: Optional[str]) -> bytes:
+    """Contenu KML en octets UTF-8 d'après la colonne compression (NULL : non compressé)"""
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("Entrée compressée en zstd : module zstandard requis")
+        return zstandard.ZstdDecompressor().decompress(kml_content)
+    if compression == 'zlib':
+        return zlib.decompress(kml_content)
+    return _as_bytes(kml_content)
+
+def _decompress_or_none(volume_pk: int, kml_content: Union[str, bytes],
+                        compression: Optional[str]) -> Optional[bytes]:
+    """Contenu KML décompressé, ou None si l'entrée est illisible (journalisé)"""
+    try:
+        return _decompress(kml_content, compression)
+    except DECOMPRESS_ERRORS as e:
+        logger.warning("⚠ Entrée du cache illisible pour le volume %s (%s): %s",
+                       volume_pk, compression, e)
+        return None
+
 class KMLCacheService:
     """
     Service de gestion du cache KML en base de données (par volume)
     """
     
-    def __init__(self, db_connection: sqlite3.Connection):
-        self.db_connection = db_connection
-        self.stats = {
-            'cache_hits': 0,
-            'cache_misses': 0,
-            'cache_stores': 0,
-            'cache_invalidations': 0
+    def __init__(self, db_connection: Union[sqlite3.Connection, str]):
+        """
+        Initialise le service sur une connexion existante ou sur un fichier de base
+        
+        Args:
+            db_connection: Connexion SQLite, de préférence ouverte avec isolation_level=None
+                           (les rafales d'écriture peuvent alors être encadrées par BEGIN IMMEDIATE)
+                           et un cached_statements suffisant (défaut 128) si elle sert aussi
+                           à de nombreuses autres requêtes.
+                           Ou chemin de la base : le service ouvre alors sa propre connexion
+                           d'écriture et un pool de connexions en lecture seule (WAL : les
+                           lectures ne sont pas bloquées par les écritures)
+        """
+        self._readers = None
+        self._database_path = None
+        self._pool_lock = threading.Lock()
+        self._transaction_depth = 0
+        # Invalidations faites dans un bloc transaction() pas encore validé
+        self._pending_invalidations = 0
+        self._criteria_sql_cache: Dict[int, str] = {}
+        # Tenus à jour par les écritures de ce service uniquement (pas par d'autres processus)
+        self._presence = OrderedDict()
+        self._contents = OrderedDict()
+        if isinstance(db_connection, str):
+            self.db_connection = sqlite3.connect(db_connection, isolation_level=None)
+        else:
+            self.db_connection = db_connection
+        self._configure_connection(owns_connection=isinstance(db_connection, str))
+        self._ensure_schema()
+        if isinstance(db_connection, str):
+            self._database_path = db_connection
+            self._readers = queue.Queue()
+            for _ in range(READER_POOL_SIZE):
+                self._readers.put(self._open_reader(db_connection))
+        self.reset_session_stats()
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Compteurs de session regroupés en dictionnaire (instantané)"""
+        return {
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_stores': self.cache_stores,
+            'cache_invalidations': self.cache_invalidations
         }
     
-    def get_volume_kml(self, volume_pk: int) -> Optional[str]:
+    def _configure_connection(self, owns_connection: bool) -> None:
+        """
+        Applique les PRAGMA de CONNECTION_PRAGMAS (une seule fois par connexion)
+        
+        Args:
+            owns_connection: Connexion ouverte par le service (depuis un chemin) : passe
+                             aussi la base en WAL pour le pool de lecture. Une connexion
+                             fournie par l'appelant ne reçoit que les réglages propres à
+                             la connexion (le mode de journal est persistant dans le fichier)
+        """
+        try:
+            # cache_size est propre à la connexion : déjà à notre valeur = déjà configurée
+            if self.db_connection.execute("PRAGMA cache_size").fetchone()[0] == CACHE_SIZE_KIB:
+                return
+            pragmas = CONNECTION_PRAGMAS + [WAL_PRAGMA] if owns_connection else CONNECTION_PRAGMAS
+            for pragma in pragmas:
+                self.db_connection.execute(pragma)
+        except sqlite3.Error as e:
+            # WAL impossible en transaction ou en lecture seule : réglages précédents conservés
+            logger.warning("⚠ Réglages de connexion du cache non appliqués: %s", e)
+    
+    def _ensure_schema(self) -> None:
+        """
+        Ajoute la colonne compression et les index de CACHE_INDEXES manquants
+        (bases créées avant leur ajout)
+        """
+        try:
+            columns = {row[1] for row in self.db_connection.execute("PRAGMA table_info(kml_cache)")}
+            if columns and 'compression' not in columns:
+                self.db_connection.execute("ALTER TABLE kml_cache ADD COLUMN compression TEXT")
+            for index_sql in CACHE_INDEXES:
+                self.db_connection.execute(index_sql)
+            self.db_connection.commit()
+        except sqlite3.Error as e:
+            logger.warning("⚠ Schéma du cache non mis à jour: %s", e)
+    
+    def _open_reader(self, database_path: str) -> sqlite3.Connection:
+        """Ouvre une connexion en lecture seule du pool (partageable entre threads)"""
+        reader = sqlite3.connect(f'file:{database_path}?mode=ro', uri=True, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            reader.execute(pragma)
+        return reader
+    
+    @contextmanager
+    def _read(self):
+        """
+        Fournit une connexion pour une lecture : une connexion du pool (rendue ensuite),
+        ou la connexion du service quand il a été créé sur une connexion existante
+        
+        Pool vide au-delà de READER_CHECKOUT_TIMEOUT (lectures imbriquées, nombreux
+        threads) ou fermé : connexion en lecture seule ouverte puis fermée pour l'occasion.
+        """
+        readers = self._readers
+        if readers is None and self._database_path is None:
+            yield self.db_connection
+            return
+        reader = None
+        if readers is not None:
+            try:
+                reader = readers.get(timeout=READER_CHECKOUT_TIMEOUT)
+            except queue.Empty:
+                reader = None
+        pooled = reader is not None
+        if not pooled:
+            reader = self._open_reader(self._database_path)
+        try:
+            yield reader
+        finally:
+            self._release_reader(reader, pooled)
+    
+    def _release_reader(self, reader: sqlite3.Connection, pooled: bool) -> None:
+        """Rend une connexion au pool, ou la ferme (connexion d'appoint, pool fermé)"""
+        with self._pool_lock:
+            if pooled and self._readers is not None:
+                self._readers.put(reader)
+                return
+        reader.close()
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Encadre plusieurs écritures dans une seule transaction (une synchronisation disque)
+        
+        Les méthodes d'écriture appelées dans le bloc ne valident pas elles-mêmes ;
+        tout est validé en sortie du bloc, ou annulé si une exception s'en échappe.
+        Un bloc imbriqué est un point de sauvegarde (SAVEPOINT) de la transaction
+        englobante : son échec n'annule que ses propres écritures. Il en va de même
+        quand la connexion a déjà une transaction ouverte par l'appelant : le bloc
+        n'en valide ni n'en annule le reste, COMMIT/ROLLBACK restent à l'appelant.
+        
+        Exemple:
+            with cache_service.transaction():
+                for volume_pk in volumes:
+                    cache_service.invalidate_volume_cache(volume_pk)
+        """
+        if self._transaction_depth or self.db_connection.in_transaction:
+            yield from self._savepoint()
+            return
+        self.db_connection.execute('BEGIN IMMEDIATE')
+        self._transaction_depth = 1
+        try:
+            yield
+            self.db_connection.commit()
+            self._commit_pending_counts()
+        except BaseException:
+            self.db_connection.rollback()
+            self._pending_invalidations = 0
+            # Mémos éventuellement mis à jour par des écritures annulées
+            self._forget_all()
+            raise
+        finally:
+            self._transaction_depth = 0
+    
+    def _savepoint(self):
+        """
+        Corps d'un bloc transaction() imbriqué ou ouvert dans une transaction de
+        l'appelant : SAVEPOINT, puis RELEASE ou ROLLBACK TO
+        """
+        self._transaction_depth += 1
+        name = f'kml_cache_{self._transaction_depth}'
+        pending_before = self._pending_invalidations
+        self.db_connection.execute(f'SAVEPOINT {name}')
+        try:
+            yield
+            self.db_connection.execute(f'RELEASE {name}')
+        except BaseException:
+            self.db_connection.execute(f'ROLLBACK TO {name}')
+            self.db_connection.execute(f'RELEASE {name}')
+            self._pending_invalidations = pending_before
+            self._forget_all()
+            raise
+        finally:
+            self._transaction_depth -= 1
+        # Bloc le plus externe du service dans une transaction de l'appelant : sa
+        # validation échappe au service, les invalidations sont comptées à la sortie
+        if not self._transaction_depth:
+            self._commit_pending_counts()
+    
+    def _count_invalidations(self, count: int) -> None:
+        """Compte des invalidations écrites, à la validation du bloc transaction() en cours"""
+        if self._transaction_depth:
+            self._pending_invalidations += count
+        else:
+            self.cache_invalidations += count
+    
+    def _commit_pending_counts(self) -> None:
+        """Reporte dans les statistiques les invalidations du bloc qui vient d'être validé"""
+        self.cache_invalidations += self._pending_invalidations
+        self._pending_invalidations = 0
+    
+    def _recall(self, memo: OrderedDict, volume_pk: int):
+        """Valeur mémorisée pour un volume (marquée récente), None si absente"""
+        try:
+            memo.move_to_end(volume_pk)
+            return memo[volume_pk]
+        except KeyError:
+            return None
+    
+    def _remember(self, memo: OrderedDict, volume_pk: int, value, maxsize: int) -> None:
+        """Mémorise une valeur pour un volume en évinçant la moins récente au-delà de maxsize"""
+        memo[volume_pk] = value
+        memo.move_to_end(volume_pk)
+        if len(memo) > maxsize:
+            memo.popitem(last=False)
+    
+    def _forget_all(self) -> None:
+        """Vide les mémos après une suppression portant sur des volumes non énumérés"""
+        self._presence.clear()
+        self._contents.clear()
+    
+    def close(self):
+        """
+        Ferme les connexions ouvertes par le service (pool de lecture et écriture)
+        
+        Les connexions encore prêtées sont fermées à leur restitution.
+        """
+        with self._pool_lock:
+            readers, self._readers = self._readers, None
+        if readers is None:
+            return
+        self._database_path = None
+        while True:
+            try:
+                readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self.db_connection.close()
+    
+    def get_volume_kml(self, volume_pk: int) -> Optional[bytes]:
         """
         Récupère le contenu KML d'un volume depuis le cache
         
@@ -32,60 +402,129 @@ class KMLCacheService:
             volume_pk: Clé primaire du volume
         
         Returns:
-            Contenu KML ou None si non trouvé
+            Contenu KML en octets UTF-8 (à écrire tel quel en mode 'wb') ou None si non trouvé
         """
+        content = self._recall(self._contents, volume_pk)
+        if content is not None:
+            self.cache_hits += 1
+            return content
+        if self._recall(self._presence, volume_pk) is False:
+            self.cache_misses += 1
+            return None
+        
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute('''
-                SELECT kml_content FROM kml_cache 
-                WHERE volume_ref = ?
-            ''', (volume_pk,))
-            
-            result = cursor.fetchone()
-            if result:
-                self.stats['cache_hits'] += 1
-                return result[0]
-            else:
-                self.stats['cache_misses'] += 1
-                return None
+            with self._read() as connection:
+                cursor = connection.cursor()
+                cursor.execute(GET_VOLUME_SQL, (volume_pk,))
+                
+                result = cursor.fetchone()
+                content = _decompress_or_none(volume_pk, *result) if result else None
+                if content is not None:
+                    self.cache_hits += 1
+                    self._remember(self._contents, volume_pk, content, MEMO_CONTENT_SIZE)
+                    self._remember(self._presence, volume_pk, True, MEMO_PRESENCE_SIZE)
+                    return content
+                else:
+                    # Entrée absente ou illisible : à régénérer par l'appelant
+                    self.cache_misses += 1
+                    self._remember(self._presence, volume_pk, False, MEMO_PRESENCE_SIZE)
+                    return None
                 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lecture cache volume {volume_pk}: {e}")
+            logger.error("❌ Erreur lecture cache volume %s: %s", volume_pk, e)
             return None
     
-    def store_volume_kml(self, volume_pk: int, kml_content: str) -> bool:
+    def get_volume_kml_str(self, volume_pk: int) -> Optional[str]:
+        """
+        Contenu KML d'un volume décodé en texte (appelants attendant un str)
+        
+        Args:
+            volume_pk: Clé primaire du volume
+        
+        Returns:
+            Contenu KML ou None si non trouvé
+        """
+        content = self.get_volume_kml(volume_pk)
+        return content.decode('utf-8') if content is not None else None
+    
+    def store_volume_kml(self, volume_pk: int, kml_content: Union[str, bytes]) -> bool:
         """
         Stocke le contenu KML d'un volume en cache
         
+        Une transaction (et une synchronisation disque) par appel hors d'un bloc
+        transaction() : pour plusieurs volumes, préférer store_volume_kml_batch.
+        
         Args:
             volume_pk: Clé primaire du volume
-            kml_content: Contenu KML à stocker
+            kml_content: Contenu KML à stocker (texte ou octets UTF-8)
+        
+        Returns:
+            True si succès, False sinon
+        """
+        return self.store_volume_kml_batch([(volume_pk, kml_content)])
+    
+    def store_volume_kml_batch(self, items: List[Tuple[int, Union[str, bytes]]]) -> bool:
+        """
+        Stocke le contenu KML de plusieurs volumes en une seule transaction
+        
+        Le contenu est stocké en BLOB UTF-8 compressé (zstd, sinon zlib) ; l'empreinte
+        porte sur le KML non compressé. La taille n'est pas stockée : length(kml_content).
+        
+        Args:
+            items: Liste de tuples (volume_pk, kml_content), contenu en texte ou octets UTF-8
         
         Returns:
             True si succès, False sinon
         """
         try:
-            content_hash = hashlib.sha256(kml_content.encode('utf-8')).hexdigest()
-            file_size = len(kml_content.encode('utf-8'))
+            if len(items) < PARALLEL_MIN_ITEMS:
+                rows = [self._encode_one(item) for item in items]
+            else:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                    rows = list(executor.map(self._encode_one, items))
             
-            cursor = self.db_connection.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO kml_cache 
-                (volume_ref, kml_content, content_hash, file_size)
-                VALUES (?, ?, ?, ?)
-            ''', (volume_pk, kml_content, content_hash, file_size))
+            with self.transaction():
+                self.db_connection.executemany(STORE_VOLUME_SQL, rows)
             
-            self.db_connection.commit()
-            self.stats['cache_stores'] += 1
+            self.cache_stores += len(rows)
+            for volume_pk, _ in items:
+                self._contents.pop(volume_pk, None)
+                self._remember(self._presence, volume_pk, True, MEMO_PRESENCE_SIZE)
             return True
             
         except sqlite3.Error as e:
-            print(f"❌ Erreur stockage KML volume {volume_pk}: {e}")
+            logger.error("❌ Erreur stockage KML de %s volume(s): %s", len(items), e)
             return False
         except Exception as e:
-            print(f"❌ Erreur inattendue stockage volume {volume_pk}: {e}")
+            logger.error("❌ Erreur inattendue stockage de %s volume(s): %s", len(items), e)
             return False
     
+    def _encode_one(self, item: Tuple[int, Union[str, bytes]]) -> Tuple[int, bytes, str, str]:
+        """
+        Prépare la ligne à stocker pour un volume (sans accès à la base : exécutable en thread)
+        
+        Args:
+            item: Tuple (volume_pk, kml_content)
+        
+        Returns:
+            Tuple (volume_pk, contenu compressé, compression, empreinte) pour STORE_VOLUME_SQL
+        """
+        volume_pk, kml_content = item
+        kml_bytes = _as_bytes(kml_content)
+        return (volume_pk, *_compress(kml_bytes), self._fingerprint(kml_bytes))
+    
+    def _fingerprint(self, kml_bytes: bytes) -> str:
+        """
+        Empreinte du contenu KML (octets UTF-8)
+        
+        L'empreinte ne sert qu'à détecter les changements : un hachage non cryptographique
+        suffit. XXH3 est préfixé pour le distinguer des empreintes SHA-256 (sans préfixe),
+        conservées sans xxhash (SHA-256 est accéléré matériellement sur la plupart des CPU).
+        """
+        if xxhash is not None:
+            return 'xxh3:' + xxhash.xxh3_128_hexdigest(kml_bytes)
+        return hashlib.sha256(kml_bytes).hexdigest()
+    
     def is_volume_cached(self, volume_pk: int) -> bool:
         """
         Vérifie si le KML du volume est en cache
@@ -96,18 +535,23 @@ class KMLCacheService:
         Returns:
             True si en cache, False sinon
         """
+        present = self._recall(self._presence, volume_pk)
+        if present is not None:
+            return present
+        
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute('''
-                SELECT 1 FROM kml_cache WHERE volume_ref = ?
-            ''', (volume_pk,))
-            
-            return cursor.fetchone() is not None
+            with self._read() as connection:
+                cursor = connection.cursor()
+                cursor.execute(IS_VOLUME_CACHED_SQL, (volume_pk,))
+                
+                present = cursor.fetchone() is not None
+                self._remember(self._presence, volume_pk, present, MEMO_PRESENCE_SIZE)
+                return present
             
         except sqlite3.Error:
             return False
     
-    def get_espace_volumes_kml(self, espace_pk: int) -> List[Tuple[int, str]]:
+    def get_espace_volumes_kml(self, espace_pk: int) -> List[Tuple[int, bytes]]:
         """
         Récupère tous les KML des volumes d'un espace avec leurs IDs
         
@@ -115,26 +559,47 @@ class KMLCacheService:
             espace_pk: Clé primaire de l'espace
         
         Returns:
-            Liste de tuples (volume_pk, kml_content) ordonnés par séquence
+            Liste de tuples (volume_pk, kml_content en octets) ordonnés par séquence
         """
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute('''
-                SELECT v.pk, kc.kml_content 
+            return list(self.iter_espace_volumes_kml(espace_pk))
+            
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lecture cache espace %s: %s", espace_pk, e)
+            return []
+    
+    def iter_espace_volumes_kml(self, espace_pk: int) -> Iterator[Tuple[int, bytes]]:
+        """
+        Parcourt les KML des volumes d'un espace sans les décompresser tous d'avance
+        
+        Les lignes (compressées) sont lues d'un bloc et la connexion de lecture est rendue
+        avant le premier volume : l'appelant peut relire le cache pendant le parcours.
+        
+        Args:
+            espace_pk: Clé primaire de l'espace
+        
+        Returns:
+            Itérateur de tuples (volume_pk, kml_content en octets) ordonnés par séquence
+            (entrées illisibles ignorées, sqlite3.Error propagée à l'appelant)
+        """
+        with self._read() as connection:
+            cursor = connection.execute('''
+                SELECT v.pk, kc.kml_content, kc.compression
                 FROM kml_cache kc
                 JOIN volumes v ON kc.volume_ref = v.pk
                 JOIN parties p ON v.partie_ref = p.pk
                 WHERE p.espace_ref = ?
                 ORDER BY v.sequence
             ''', (espace_pk,))
-            
-            results = cursor.fetchall()
-            self.stats['cache_hits'] += len(results)
-            return results
-            
-        except sqlite3.Error as e:
-            print(f"❌ Erreur lecture cache espace {espace_pk}: {e}")
-            return []
+            rows = cursor.fetchall()
+        
+        for volume_pk, kml_content, compression in rows:
+            content = _decompress_or_none(volume_pk, kml_content, compression)
+            if content is None:
+                self.cache_misses += 1
+                continue
+            self.cache_hits += 1
+            yield volume_pk, content
     
     def get_espace_cache_status(self, espace_pk: int) -> Dict[str, int]:
         """
@@ -147,33 +612,26 @@ class KMLCacheService:
             Dictionnaire avec statistiques de cache
         """
         try:
-            cursor = self.db_connection.cursor()
-            
-            # Total des volumes de l'espace
-            cursor.execute('''
-                SELECT COUNT(*) FROM volumes v
-                JOIN parties p ON v.partie_ref = p.pk
-                WHERE p.espace_ref = ?
-            ''', (espace_pk,))
-            total_volumes = cursor.fetchone()[0]
-            
-            # Volumes en cache
-            cursor.execute('''
-                SELECT COUNT(*) FROM kml_cache kc
-                JOIN volumes v ON kc.volume_ref = v.pk
-                JOIN parties p ON v.partie_ref = p.pk
-                WHERE p.espace_ref = ?
-            ''', (espace_pk,))
-            cached_volumes = cursor.fetchone()[0]
-            
-            return {
-                'total_volumes': total_volumes,
-                'cached_volumes': cached_volumes,
-                'cache_ratio': cached_volumes / total_volumes if total_volumes > 0 else 0
-            }
+            with self._read() as connection:
+                cursor = connection.cursor()
+                
+                # Total des volumes de l'espace et volumes en cache en une seule jointure
+                cursor.execute('''
+                    SELECT COUNT(v.pk), COUNT(kc.volume_ref) FROM volumes v
+                    JOIN parties p ON v.partie_ref = p.pk
+                    LEFT JOIN kml_cache kc ON kc.volume_ref = v.pk
+                    WHERE p.espace_ref = ?
+                ''', (espace_pk,))
+                total_volumes, cached_volumes = cursor.fetchone()
+                
+                return {
+                    'total_volumes': total_volumes,
+                    'cached_volumes': cached_volumes,
+                    'cache_ratio': cached_volumes / total_volumes if total_volumes > 0 else 0
+                }
             
         except sqlite3.Error as e:
-            print(f"❌ Erreur statut cache espace {espace_pk}: {e}")
+            logger.error("❌ Erreur statut cache espace %s: %s", espace_pk, e)
             return {'total_volumes': 0, 'cached_volumes': 0, 'cache_ratio': 0}
     
     def invalidate_volume_cache(self, volume_pk: int) -> bool:
@@ -187,18 +645,19 @@ class KMLCacheService:
             True si succès, False sinon
         """
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute('DELETE FROM kml_cache WHERE volume_ref = ?', (volume_pk,))
-            deleted_count = cursor.rowcount
-            self.db_connection.commit()
+            with self.transaction():
+                deleted_count = self.db_connection.execute(INVALIDATE_VOLUME_SQL,
+                                                           (volume_pk,)).rowcount
+            self._contents.pop(volume_pk, None)
+            self._remember(self._presence, volume_pk, False, MEMO_PRESENCE_SIZE)
             
             if deleted_count > 0:
-                self.stats['cache_invalidations'] += 1
+                self._count_invalidations(1)
             
             return True
             
         except sqlite3.Error as e:
-            print(f"❌ Erreur invalidation cache volume {volume_pk}: {e}")
+            logger.error("❌ Erreur invalidation cache volume %s: %s", volume_pk, e)
             return False
     
     def invalidate_espace_cache(self, espace_pk: int) -> int:
@@ -212,32 +671,30 @@ class KMLCacheService:
             Nombre de volumes invalidés
         """
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute('''
-                DELETE FROM kml_cache 
-                WHERE volume_ref IN (
-                    SELECT v.pk FROM volumes v
-                    JOIN parties p ON v.partie_ref = p.pk
-                    WHERE p.espace_ref = ?
-                )
-            ''', (espace_pk,))
-            
-            deleted_count = cursor.rowcount
-            self.db_connection.commit()
+            with self.transaction():
+                deleted_count = self.db_connection.execute('''
+                    DELETE FROM kml_cache 
+                    WHERE volume_ref IN (
+                        SELECT v.pk FROM volumes v
+                        JOIN parties p ON v.partie_ref = p.pk
+                        WHERE p.espace_ref = ?
+                    )
+                ''', (espace_pk,)).rowcount
+            self._forget_all()
             
             if deleted_count > 0:
-                self.stats['cache_invalidations'] += deleted_count
+                self._count_invalidations(deleted_count)
             
             return deleted_count
             
         except sqlite3.Error as e:
-            print(f"❌ Erreur invalidation cache espace {espace_pk}: {e}")
+            logger.error("❌ Erreur invalidation cache espace %s: %s", espace_pk, e)
             return 0
     
     def get_cached_volumes_by_criteria(self, classe: str = None, 
                                      espace_type: str = None,
                                      altitude_min: int = None,
-                                     altitude_max: int = None) -> List[Tuple[int, str, Dict]]:
+                                     altitude_max: int = None) -> List[Tuple[int, bytes, Dict]]:
         """
         Récupère les volumes en cache selon des critères
         
@@ -248,67 +705,90 @@ class KMLCacheService:
             altitude_max: Altitude maximum en pieds
         
         Returns:
-            Liste de tuples (volume_pk, kml_content, volume_info)
+            Liste de tuples (volume_pk, kml_content en octets, volume_info)
         """
         try:
-            # Construction de la requête avec filtres
-            where_conditions = []
-            params = []
-            
-            base_query = '''
-                SELECT v.pk, kc.kml_content, v.lk, v.classe, v.plafond, v.plancher,
-                       e.nom as espace_nom, e.type_espace
-                FROM kml_cache kc
-                JOIN volumes v ON kc.volume_ref = v.pk
-                JOIN parties p ON v.partie_ref = p.pk
-                JOIN espaces e ON p.espace_ref = e.pk
-            '''
-            
-            if classe:
-                where_conditions.append('v.classe = ?')
-                params.append(classe)
-            
-            if espace_type:
-                where_conditions.append('e.type_espace LIKE ?')
-                params.append(f'%{espace_type}%')
-            
-            if altitude_min is not None:
-                where_conditions.append('CAST(v.plancher AS INTEGER) >= ?')
-                params.append(altitude_min)
-            
-            if altitude_max is not None:
-                where_conditions.append('CAST(v.plafond AS INTEGER) <= ?')
-                params.append(altitude_max)
-            
-            if where_conditions:
-                query = base_query + ' WHERE ' + ' AND '.join(where_conditions)
-            else:
-                query = base_query
-            
-            query += ' ORDER BY e.nom, v.sequence'
-            
-            cursor = self.db_connection.cursor()
-            cursor.execute(query, params)
-            
-            results = []
-            for row in cursor.fetchall():
-                volume_pk, kml_content = row[0], row[1]
-                volume_info = {
-                    'lk': row[2],
-                    'classe': row[3],
-                    'plafond': row[4],
-                    'plancher': row[5],
-                    'espace_nom': row[6],
-                    'espace_type': row[7]
-                }
-                results.append((volume_pk, kml_content, volume_info))
-            
-            return results
+            return list(self.iter_cached_volumes_by_criteria(classe, espace_type,
+                                                             altitude_min, altitude_max))
             
         except sqlite3.Error as e:
-            print(f"❌ Erreur recherche cache par critères: {e}")
+            logger.error("❌ Erreur recherche cache par critères: %s", e)
             return []
     
+    def iter_cached_volumes_by_criteria(self, classe: str = None, 
+                                        espace_type: str = None,
+                                        altitude_min: int = None,
+                                        altitude_max: int = None) -> Iterator[Tuple[int, bytes, Dict]]:
+        """
+        Parcourt les volumes en cache selon des critères, décompressés un à un
+        
+        Les lignes sont lues d'un bloc et la connexion de lecture est rendue avant
+        le premier volume (relectures du cache possibles pendant le parcours).
+        
+        Args:
+            classe: Classe d'espace (A, B, C, D, E)
+            espace_type: Type d'espace (TMA, CTR, etc.)
+            altitude_min: Altitude minimum en pieds
+            altitude_max: Altitude maximum en pieds
+        
+        Returns:
+            Itérateur de tuples (volume_pk, kml_content en octets, volume_info)
+            (entrées illisibles ignorées, sqlite3.Error propagée à l'appelant)
+        """
+        # Filtres renseignés : un bit par critère, la requête est générée une fois par forme
+        params = []
+        shape = 0
+        if classe:
+            shape |= CRITERIA_CLASSE
+            params.append(classe)
+        if espace_type:
+            shape |= CRITERIA_ESPACE_TYPE
+            params.append(f'%{espace_type}%')
+        if altitude_min is not None:
+            shape |= CRITERIA_ALTITUDE_MIN
+            params.append(altitude_min)
+        if altitude_max is not None:
+            shape |= CRITERIA_ALTITUDE_MAX
+            params.append(altitude_max)
+        
+        query = self._criteria_sql_cache.get(shape)
+        if query is None:
+            query = self._criteria_sql_cache[shape] = self._build_criteria_query(shape)
+        
+        with self._read() as connection:
+            rows = connection.execute(query, params).fetchall()
+        
+        for (volume_pk, kml_content, compression, lk, classe_volume, plafond, plancher,
+             espace_nom, type_espace) in rows:
+            content = _decompress_or_none(volume_pk, kml_content, compression)
+            if content is None:
+                continue
+            volume_info = {
+                'lk': lk,
+                'classe': classe_volume,
+                'plafond': plafond,
+                'plancher': plancher,
+                'espace_nom': espace_nom,
+                'espace_type': type_espace
+            }
+            yield volume_pk, content, volume_info
+    
+    def _build_criteria_query(self, shape: int) -> str:
+        """
+        Génère la requête de iter_cached_volumes_by_criteria pour une combinaison de filtres
+        
+        Args:
+            shape: Masque des filtres renseignés (bits CRITERIA_*)
+        
+        Returns:
+            Texte SQL, paramètres attendus dans l'ordre des bits
+        """
+        where_conditions = [condition for bit, condition in CRITERIA_CONDITIONS if shape & bit]
+        query = CRITERIA_BASE_SQL
+        if where_conditions:
+            query += ' WHERE ' + ' AND '.join(where_conditions)
+        return query + ' ORDER BY e.nom, v.sequence'
+    
     def cleanup_orphaned_cache(self) -> int:
         """
         Nettoie les entrées de cache orphelines (volumes supprimés)
@@ -317,21 +797,42 @@ class KMLCacheService:
             Nombre d'entrées supprimées
         """
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute('''
-                DELETE FROM kml_cache 
-                WHERE volume_ref NOT IN (SELECT pk FROM volumes)
-            ''')
-            
-            deleted_count = cursor.rowcount
-            self.db_connection.commit()
+            with self.transaction():
+                deleted_count = self.db_connection.execute('''
+                    DELETE FROM kml_cache 
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM volumes v WHERE v.pk = kml_cache.volume_ref
+                    )
+                ''').rowcount
+            self._forget_all()
             
             return deleted_count
             
         except sqlite3.Error as e:
-            print(f"❌ Erreur nettoyage cache orphelin: {e}")
+            logger.error("❌ Erreur nettoyage cache orphelin: %s", e)
             return 0
     
+    def optimize(self) -> bool:
+        """
+        Met à jour les statistiques du planificateur (à appeler en fin de génération)
+        
+        Après des stockages en masse, sqlite_stat1 guide l'ordre des jointures
+        kml_cache -> volumes -> parties -> espaces.
+        
+        Returns:
+            True si succès, False sinon
+        """
+        try:
+            with self.transaction():
+                self.db_connection.execute("PRAGMA optimize")
+                for table in ANALYZE_TABLES:
+                    self.db_connection.execute(f"ANALYZE {table}")
+            return True
+            
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur optimisation cache: %s", e)
+            return False
+    
     def get_cache_statistics(self) -> Dict:
         """
         Retourne les statistiques complètes du cache
@@ -340,53 +841,56 @@ class KMLCacheService:
             Dictionnaire avec toutes les statistiques
         """
         try:
-            cursor = self.db_connection.cursor()
-            
-            # Statistiques générales
-            cursor.execute("SELECT COUNT(*), SUM(file_size), AVG(file_size) FROM kml_cache")
-            general_stats = cursor.fetchone()
-            
-            # Statistiques par classe
-            cursor.execute('''
-                SELECT v.classe, COUNT(*), SUM(kc.file_size)
-                FROM kml_cache kc
-                JOIN volumes v ON kc.volume_ref = v.pk
-                GROUP BY v.classe
-                ORDER BY COUNT(*) DESC
-            ''')
-            class_stats = cursor.fetchall()
-            
-            # Statistiques temporelles
-            cursor.execute('''
-                SELECT 
-                    MIN(generated_at) as oldest,
-                    MAX(generated_at) as newest,
-                    COUNT(CASE WHEN generated_at > datetime('now', '-1 day') THEN 1 END) as last_24h
-                FROM kml_cache
-            ''')
-            time_stats = cursor.fetchone()
-            
-            return {
-                'session_stats': self.stats.copy(),
-                'total_entries': general_stats[0] or 0,
-                'total_size_bytes': general_stats[1] or 0,
-                'average_size_bytes': general_stats[2] or 0,
-                'class_distribution': [{'classe': row[0], 'count': row[1], 'size': row[2]} 
-                                     for row in class_stats],
-                'oldest_entry': time_stats[0],
-                'newest_entry': time_stats[1],
-                'entries_last_24h': time_stats[2] or 0
-            }
+            with self._read() as connection:
+                cursor = connection.cursor()
+                
+                # Statistiques générales (tailles stockées, donc compressées)
+                cursor.execute('''
+                    SELECT COUNT(*), SUM(length(kml_content)), AVG(length(kml_content))
+                    FROM kml_cache
+                ''')
+                general_stats = cursor.fetchone()
+                
+                # Statistiques par classe
+                cursor.execute('''
+                    SELECT v.classe, COUNT(*), SUM(length(kc.kml_content))
+                    FROM kml_cache kc
+                    JOIN volumes v ON kc.volume_ref = v.pk
+                    GROUP BY v.classe
+                    ORDER BY COUNT(*) DESC
+                ''')
+                class_stats = cursor.fetchall()
+                
+                # Statistiques temporelles
+                cursor.execute('''
+                    SELECT 
+                        MIN(generated_at) as oldest,
+                        MAX(generated_at) as newest,
+                        COUNT(CASE WHEN generated_at > datetime('now', '-1 day') THEN 1 END) as last_24h
+                    FROM kml_cache
+                ''')
+                time_stats = cursor.fetchone()
+                
+                return {
+                    'session_stats': self.stats,
+                    'total_entries': general_stats[0] or 0,
+                    'total_size_bytes': general_stats[1] or 0,
+                    'average_size_bytes': general_stats[2] or 0,
+                    'class_distribution': [{'classe': row[0], 'count': row[1], 'size': row[2]} 
+                                         for row in class_stats],
+                    'oldest_entry': time_stats[0],
+                    'newest_entry': time_stats[1],
+                    'entries_last_24h': time_stats[2] or 0
+                }
             
         except sqlite3.Error as e:
-            print(f"❌ Erreur statistiques cache: {e}")
+            logger.error("❌ Erreur statistiques cache: %s", e)
             return {'error': str(e)}
     
     def reset_session_stats(self):
         """Remet à zéro les statistiques de session"""
-        self.stats = {
-            'cache_hits': 0,
-            'cache_misses': 0,
-            'cache_stores': 0,
-            'cache_invalidations': 0
-        }
\ No newline at end of file
+        # Attributs simples plutôt qu'un dictionnaire : incrémentés dans les boucles de lecture
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_stores = 0
+        self.cache_invalidations = 0
\ No newline at end of file
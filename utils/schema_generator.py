@@ -11,6 +11,31 @@ import os
 from typing import Dict, List, Optional
 import xml.etree.ElementTree as ET
 
+# Taille de page de la base (défaut SQLite : 4096) : arbres B moins profonds pour les
+# grosses lignes (contours, cache KML). Ne s'applique qu'à une base encore vide.
+PAGE_SIZE = 8192
+
+# Réglages de la connexion de création : le schéma est recréé en entier, la
+# durabilité des écritures intermédiaires est inutile
+SCHEMA_PRAGMAS = [
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA cache_size=-65536",       # 64 Mo de cache de pages
+    "PRAGMA temp_store=MEMORY",
+]
+
+# Plancher normalisé en pieds (LIKE insensible à la casse, CAST entier) : définition unique,
+# reprise par la colonne générée volumes.plancher_ft et par generate_kml/extractor.py
+# (ajout de la colonne aux bases existantes, calcul direct si elle est absente)
+PLANCHER_FT_EXPR = """CASE
+        WHEN plancher IS NULL OR plancher IN ('SFC', 'GND') THEN 0
+        WHEN plancher_ref_unite LIKE '%FL%' THEN CAST(plancher AS INTEGER) * 100
+        WHEN plancher_ref_unite LIKE '%ft%' THEN CAST(plancher AS INTEGER)
+        WHEN plancher_ref_unite LIKE '%m%' THEN CAST(plancher AS INTEGER) * 3.28084
+        ELSE 0
+    END"""
+PLANCHER_FT_COLUMN = f"REAL GENERATED ALWAYS AS ({PLANCHER_FT_EXPR}) VIRTUAL"
+
 class SQLiteSchemaGenerator:
     """
     Générateur de schéma SQLite basé sur l'analyse du XSD Espace.xsd
@@ -119,7 +144,9 @@ class SQLiteSchemaGenerator:
                     ('plancher', 'TEXT'),
                     ('classe', 'TEXT'),
                     ('hor_code', 'TEXT'),
-                    ('hor_txt', 'TEXT')
+                    ('hor_txt', 'TEXT'),
+                    # Plancher normalisé en pieds (colonne générée, filtres d'altitude)
+                    ('plancher_ft', PLANCHER_FT_COLUMN)
                 ]
             },
             'services': {
@@ -156,18 +183,25 @@ class SQLiteSchemaGenerator:
             # Se connecter à la base (la crée si elle n'existe pas)
             self.db_connection = sqlite3.connect(db_path)
             cursor = self.db_connection.cursor()
+            # Avant la première table : sans effet sur une base existante
+            cursor.execute(f"PRAGMA page_size={PAGE_SIZE}")
+            for pragma in SCHEMA_PRAGMAS:
+                cursor.execute(pragma)
             
             print(f"✓ Base de données créée/connectée: {db_path}")
             
-            # Créer les tables
+            # Tables puis index en un seul script et une seule transaction
+            ddl = []
             for table_name, table_def in self.tables.items():
-                self.create_table(cursor, table_name, table_def['columns'])
+                ddl.extend(self.get_table_ddl(table_name, table_def['columns']))
+            indexes = self.get_indexes()
+            ddl.extend(indexes)
             
-            # Créer les index pour optimiser les recherches
-            self.create_indexes(cursor)
+            self.db_connection.executescript("BEGIN;\n" + ";\n".join(ddl) + ";\nCOMMIT;")
             
-            # Valider les changements
-            self.db_connection.commit()
+            for table_name in self.tables:
+                print(f"  ✓ Table '{table_name}' créée")
+            print(f"  ✓ {len(indexes)} index créés")
             
             print(f"✓ Schéma SQLite créé avec {len(self.tables)} tables")
             return True
@@ -179,11 +213,8 @@ class SQLiteSchemaGenerator:
             print(f"✗ Erreur: {e}")
             return False
     
-    def create_table(self, cursor: sqlite3.Cursor, table_name: str, columns: List[tuple]) -> None:
-        """Crée une table avec ses colonnes"""
-        
-        # Supprimer la table si elle existe déjà
-        cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+    def get_table_ddl(self, table_name: str, columns: List[tuple]) -> List[str]:
+        """Instructions de (re)création d'une table avec ses colonnes"""
         
         # Construire la définition de la table
         column_defs = []
@@ -201,8 +232,8 @@ class SQLiteSchemaGenerator:
         )
         """
         
-        cursor.execute(create_sql)
-        print(f"  ✓ Table '{table_name}' créée")
+        # Supprimer la table si elle existe déjà
+        return [f"DROP TABLE IF EXISTS {table_name}", create_sql]
     
     def get_foreign_keys(self, table_name: str) -> List[str]:
         """Définit les contraintes de clés étrangères pour chaque table"""
@@ -231,39 +262,50 @@ class SQLiteSchemaGenerator:
         
         return constraints.get(table_name, [])
     
-    def create_indexes(self, cursor: sqlite3.Cursor) -> None:
-        """Crée les index pour optimiser les performances"""
+    def get_indexes(self) -> List[str]:
+        """
+        Index pour optimiser les performances
+        
+        Un index par chemin d'accès réellement emprunté par les outils, plutôt qu'un
+        index par colonne :
+        - pk est le rowid (INTEGER PRIMARY KEY), présent dans tout index : un index
+          sur (fk) couvre déjà les jointures parent -> enfants qui ne lisent que pk ;
+        - les colonnes lues avec le filtre sont ajoutées en fin d'index (lk), pour
+          répondre sans lecture de la table ;
+        - un index préfixe d'un index composite est redondant (volumes(partie_ref)) ;
+        - lk n'est interrogé seul que pour les espaces ; ailleurs ces index, comme
+          ceux des clés étrangères sans parcours inverse (territoire, aérodrome
+          associé), ne faisaient que ralentir chaque insertion.
+        Les noms partagés avec extractor.py et kml_cache_service.py (créés à la
+        demande avec IF NOT EXISTS) gardent la même définition.
+        """
         indexes = [
-            # Index sur les clés logiques (lk)
-            "CREATE INDEX IF NOT EXISTS idx_territoires_lk ON territoires(lk)",
-            "CREATE INDEX IF NOT EXISTS idx_aerodromes_lk ON aerodromes(lk)",
+            # Clés logiques des espaces (égalité, IN, tri, préfixe insensible à la casse)
             "CREATE INDEX IF NOT EXISTS idx_espaces_lk ON espaces(lk)",
-            "CREATE INDEX IF NOT EXISTS idx_parties_lk ON parties(lk)",
-            "CREATE INDEX IF NOT EXISTS idx_volumes_lk ON volumes(lk)",
-            "CREATE INDEX IF NOT EXISTS idx_services_lk ON services(lk)",
-            "CREATE INDEX IF NOT EXISTS idx_frequences_lk ON frequences(lk)",
+            "CREATE INDEX IF NOT EXISTS idx_espaces_lk_nocase ON espaces(lk COLLATE NOCASE)",
+            # Liste des espaces d'un type (pk, lk)
+            "CREATE INDEX IF NOT EXISTS idx_espaces_type_lk ON espaces(type_espace, lk)",
             
-            # Index sur les clés étrangères
-            "CREATE INDEX IF NOT EXISTS idx_aerodromes_territoire ON aerodromes(territoire_ref)",
-            "CREATE INDEX IF NOT EXISTS idx_espaces_territoire ON espaces(territoire_ref)",
-            "CREATE INDEX IF NOT EXISTS idx_espaces_aerodrome ON espaces(ad_associe_ref)",
+            # Parcours parent -> enfants (extraction d'un espace, export KML)
             "CREATE INDEX IF NOT EXISTS idx_parties_espace ON parties(espace_ref)",
-            "CREATE INDEX IF NOT EXISTS idx_volumes_partie ON volumes(partie_ref)",
-            "CREATE INDEX IF NOT EXISTS idx_services_aerodrome ON services(ad_ref)",
-            "CREATE INDEX IF NOT EXISTS idx_services_espace ON services(espace_ref)",
-            "CREATE INDEX IF NOT EXISTS idx_frequences_service ON frequences(service_ref)",
+            # Couvrant pour les filtres EXISTS (partie, classe) de l'export KML
+            "CREATE INDEX IF NOT EXISTS idx_volumes_partie_classe ON volumes(partie_ref, classe)",
+            "CREATE INDEX IF NOT EXISTS idx_volumes_partie_plancher_ft ON volumes(partie_ref, plancher_ft)",
+            # Volumes d'une partie dans l'ordre (lectures du cache KML par espace)
+            "CREATE INDEX IF NOT EXISTS idx_volumes_partie_sequence ON volumes(partie_ref, sequence)",
+            # Filtres d'altitude brute du cache KML (index d'expression)
+            "CREATE INDEX IF NOT EXISTS idx_volumes_plancher_int ON volumes(CAST(plancher AS INTEGER))",
+            "CREATE INDEX IF NOT EXISTS idx_volumes_plafond_int ON volumes(CAST(plafond AS INTEGER))",
+            "CREATE INDEX IF NOT EXISTS idx_services_aerodrome ON services(ad_ref, lk)",
+            "CREATE INDEX IF NOT EXISTS idx_services_espace ON services(espace_ref, lk)",
+            "CREATE INDEX IF NOT EXISTS idx_frequences_service ON frequences(service_ref, lk)",
             
             # Index sur les champs de recherche fréquents
-            "CREATE INDEX IF NOT EXISTS idx_espaces_type ON espaces(type_espace)",
-            "CREATE INDEX IF NOT EXISTS idx_espaces_nom ON espaces(nom)",
             "CREATE INDEX IF NOT EXISTS idx_aerodromes_code ON aerodromes(ad_code)",
             "CREATE INDEX IF NOT EXISTS idx_services_type ON services(service)"
         ]
         
-        for index_sql in indexes:
-            cursor.execute(index_sql)
-        
-        print(f"  ✓ {len(indexes)} index créés")
+        return indexes
     
     def close(self) -> None:
         """Ferme la connexion à la base de données"""
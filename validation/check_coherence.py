@@ -4,402 +4,608 @@ Script de vérification de cohérence entre le schéma XSD et la documentation o
 Croise le fichier Espace.xsd avec input/2022-12-28 - siaexport6a.md
 """
 
+import hashlib
 import re
 import os
-from typing import Dict, List, Set, Tuple
+import pickle
+import sys
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+# Cache des définitions analysées (spécification + XSD), invalidé par date de modification
+# des fichiers analysés et par changement de format (version ou code de ce module)
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'coherence.pkl')
+CACHE_FORMAT_VERSION = 2
+
+# Balises XSD (espace de noms XML Schema) lues par XsdParser
+_XS_NS = '{http://www.w3.org/2001/XMLSchema}'
+_XS_COMPLEX_TYPE = _XS_NS + 'complexType'
+_XS_ELEMENT = _XS_NS + 'element'
+_XS_ATTRIBUTE = _XS_NS + 'attribute'
+_XS_ANNOTATION = _XS_NS + 'annotation'
+
+# Motifs compilés une fois au chargement du module
+# Spécification : en-têtes d'entité (groupe E) et lignes d'attribut (groupe A), sur les
+# octets du fichier (motifs ASCII hormis "é" de "Entité", écrit en UTF-8)
+_SPEC_ENTRY_RE = re.compile(rb'(?P<E>### Entit\xc3\xa9: \*\*(\w+)\*\* \(([^)]+)\))'
+                            rb'|(?P<A>\| `([^`]*)`\s+([^|]+)\s+\|\s+([^|]+)\s+\|\s+([^|]+)\s+\|)')
+# Domaine de relation : "relation(Service)" (simple) ou "relation(Service)*" (multiple, groupe 2)
+_RELATION_RE = re.compile(r'relation\((\w+)\)(\*)?')
+# Préfixe testé avant la regex : la plupart des domaines ne sont pas des relations
+_RELATION_PREFIX = 'relation('
+
+# Indicateurs d'un attribut SIA (colonne des drapeaux de la spécification) en masque
+FLAG_KEY = 1        # 'cle'
+FLAG_REQUIRED = 2   # '!'
+FLAG_OPTIONAL = 4   # '?'
+
+@dataclass
+class SiaAttribute:
+    """Attribut d'une entité SIA (domaine interné, indicateurs en masque FLAG_*)"""
+    __slots__ = ('domain', 'description', 'flags')
+    domain: str
+    description: str
+    flags: int
+    
+    @property
+    def is_key(self) -> bool:
+        return bool(self.flags & FLAG_KEY)
+    
+    @property
+    def is_required(self) -> bool:
+        return bool(self.flags & FLAG_REQUIRED)
+    
+    @property
+    def is_optional(self) -> bool:
+        return bool(self.flags & FLAG_OPTIONAL)
+
+@dataclass
+class SiaEntity:
+    """Entité de la spécification SIA et ses attributs (par nom, ordre du document)"""
+    __slots__ = ('description', 'attributes')
+    description: str
+    attributes: Dict[str, SiaAttribute]
+
+@dataclass
+class XsdType:
+    """
+    complexType nommé du XSD : éléments et attributs (dictionnaires par déclaration)
+    
+    Les index par nom sont construits une fois à la création (recherches des contrôles).
+    """
+    __slots__ = ('elements', 'attributes', 'element_index', 'attribute_index', 'attribute_name_set')
+    elements: List[Dict[str, str]]
+    attributes: List[Dict[str, str]]
+    
+    def __post_init__(self):
+        self.element_index = {elem['name']: elem for elem in self.elements}
+        self.attribute_index = {attr['name']: attr for attr in self.attributes}
+        self.attribute_name_set = frozenset(self.attribute_index)
 
 class SiaSpecificationParser:
     """Parse la spécification SIA pour extraire les définitions d'entités"""
     
     def __init__(self, spec_file: str):
-        with open(spec_file, 'r', encoding='utf-8') as f:
-            self.content = f.read()
-        self.entities = {}
+        self.spec_file = spec_file
         
-    def parse_entities(self) -> Dict[str, Dict]:
+    def parse_entities(self) -> Dict[str, SiaEntity]:
         """Extrait toutes les définitions d'entités de la spécification"""
         
-        # Pattern pour trouver les entités
-        entity_pattern = r'### Entité: \*\*(\w+)\*\* \(([^)]+)\)'
-        
-        # Pattern pour les attributs
-        attr_pattern = r'\| `([^`]*)`\s+([^|]+)\s+\|\s+([^|]+)\s+\|\s+([^|]+)\s+\|'
+        # Octets bruts : pas de décodage du fichier entier, seules les valeurs retenues
+        # sont décodées. Contenu local : libéré dès la fin de l'analyse
+        with open(self.spec_file, 'rb') as f:
+            content = f.read()
         
+        # Un seul parcours du texte : en-têtes d'entité (E) et lignes d'attribut (A)
+        # alternés, chaque attribut revenant à la dernière entité rencontrée
         entities = {}
-        
-        # Trouver toutes les entités
-        for match in re.finditer(entity_pattern, self.content):
-            entity_name = match.group(1)
-            entity_desc = match.group(2)
-            entity_start = match.end()
+        attributes = None
+        
+        for match in _SPEC_ENTRY_RE.finditer(content):
+            if match.group('E'):
+                # Nouvelle entité : ses attributs suivent jusqu'à la prochaine
+                attributes = {}
+                entities[match.group(2).decode('utf-8')] = SiaEntity(match.group(3).decode('utf-8'),
+                                                                     attributes)
+                continue
             
-            # Trouver la prochaine entité ou la fin du fichier
-            next_entity = re.search(r'### Entité:', self.content[entity_start:])
-            if next_entity:
-                entity_end = entity_start + next_entity.start()
-            else:
-                entity_end = len(self.content)
+            # Ligne d'attribut avant toute entité : ignorée
+            if attributes is None:
+                continue
             
-            entity_section = self.content[entity_start:entity_end]
+            attr_flags = match.group(5)
+            attr_name = match.group(6).strip().decode('utf-8')
+            # Domaines très répétés ('Texte', 'relation(Service)'...) : une seule instance
+            attr_domain = sys.intern(match.group(7).strip().decode('utf-8'))
+            attr_desc = match.group(8).strip().decode('utf-8')
             
-            # Extraire les attributs
-            attributes = {}
-            for attr_match in re.finditer(attr_pattern, entity_section):
-                attr_flags = attr_match.group(1).strip()
-                attr_name = attr_match.group(2).strip()
-                attr_domain = attr_match.group(3).strip()
-                attr_desc = attr_match.group(4).strip()
-                
-                # Déterminer si l'attribut est obligatoire
-                is_key = 'cle' in attr_flags
-                is_required = '!' in attr_flags
-                is_optional = '?' in attr_flags
-                
-                attributes[attr_name] = {
-                    'domain': attr_domain,
-                    'description': attr_desc,
-                    'is_key': is_key,
-                    'is_required': is_required,
-                    'is_optional': is_optional,
-                    'flags': attr_flags
-                }
+            # Déterminer si l'attribut est obligatoire
+            flags = ((FLAG_KEY if b'cle' in attr_flags else 0)
+                     | (FLAG_REQUIRED if b'!' in attr_flags else 0)
+                     | (FLAG_OPTIONAL if b'?' in attr_flags else 0))
             
-            entities[entity_name] = {
-                'description': entity_desc,
-                'attributes': attributes
-            }
+            attributes[attr_name] = SiaAttribute(attr_domain, attr_desc, flags)
         
         return entities
 
+def _own_declarations(type_elem: ET.Element) -> Tuple[List[ET.Element], List[ET.Element]]:
+    """
+    Déclarations propres à un complexType : ses xs:element (séquence, choix, all) et ses
+    xs:attribute, sans descendre dans un xs:element ni dans un xs:complexType imbriqué
+    (attributs pk/lk des types de référence anonymes : Territoire, Ctr, ...)
+    
+    Args:
+        type_elem: Élément xs:complexType nommé
+    
+    Returns:
+        Tuple (éléments, attributs) dans l'ordre du document
+    """
+    elements = []
+    attributes = []
+    pending = list(reversed(type_elem))
+    while pending:
+        child = pending.pop()
+        if child.tag == _XS_ELEMENT:
+            elements.append(child)
+        elif child.tag == _XS_ATTRIBUTE:
+            attributes.append(child)
+        elif child.tag not in (_XS_COMPLEX_TYPE, _XS_ANNOTATION):
+            # Compositeurs (sequence, choice, all) et simpleContent/extension
+            pending.extend(reversed(child))
+    return elements, attributes
+
 class XsdParser:
     """Parse le fichier XSD pour extraire les définitions"""
     
     def __init__(self, xsd_file: str):
-        with open(xsd_file, 'r', encoding='utf-8') as f:
-            self.content = f.read()
+        self.xsd_file = xsd_file
     
-    def extract_complex_types(self) -> Dict[str, Dict]:
-        """Extrait les définitions de complexTypes du XSD"""
+    def extract_complex_types(self) -> Dict[str, XsdType]:
+        """
+        Extrait les définitions de complexTypes du XSD
         
-        complex_types = {}
+        Lecture en flux par l'analyseur XML (iterparse) : les déclarations sur plusieurs
+        lignes et l'ordre des attributs XML sont pris en compte, contrairement aux regex.
+        """
         
-        # Pattern pour les complexTypes
-        type_pattern = r'<xs:complexType name="(\w+)">'
+        complex_types = {}
         
-        for match in re.finditer(type_pattern, self.content):
-            type_name = match.group(1)
-            type_start = match.start()
-            
-            # Trouver la fin du complexType
-            type_end = self.content.find('</xs:complexType>', type_start)
-            if type_end == -1:
+        for _, type_elem in ET.iterparse(self.xsd_file, events=('end',)):
+            # complexTypes nommés seulement (les anonymes sont parcourus avec leur parent)
+            if type_elem.tag != _XS_COMPLEX_TYPE or 'name' not in type_elem.attrib:
                 continue
-                
-            type_section = self.content[type_start:type_end + len('</xs:complexType>')]
+            
+            # Déclarations propres au type (celles des types anonymes imbriqués exclues)
+            own_elements, own_attributes = _own_declarations(type_elem)
             
             # Extraire les éléments
             elements = []
-            element_pattern = r'<xs:element name="(\w+)"[^>]*(?:type="([^"]*)")?[^>]*(?:minOccurs="([^"]*)")?[^>]*(?:maxOccurs="([^"]*)")?[^>]*/?>'
-            
-            for elem_match in re.finditer(element_pattern, type_section):
-                elem_name = elem_match.group(1)
-                elem_type = elem_match.group(2) or "complex"
-                min_occurs = elem_match.group(3) or "1"
-                max_occurs = elem_match.group(4) or "1"
-                
+            for elem in own_elements:
+                if 'name' not in elem.attrib:
+                    continue
                 elements.append({
-                    'name': elem_name,
-                    'type': elem_type,
-                    'minOccurs': min_occurs,
-                    'maxOccurs': max_occurs
+                    'name': elem.get('name'),
+                    'type': elem.get('type', 'complex'),
+                    'minOccurs': elem.get('minOccurs', '1'),
+                    'maxOccurs': elem.get('maxOccurs', '1')
                 })
             
             # Extraire les attributs
             attributes = []
-            attr_pattern = r'<xs:attribute name="(\w+)"[^>]*(?:type="([^"]*)")?[^>]*(?:use="([^"]*)")?[^>]*/?>'
-            
-            for attr_match in re.finditer(attr_pattern, type_section):
-                attr_name = attr_match.group(1)
-                attr_type = attr_match.group(2) or "xs:string"
-                attr_use = attr_match.group(3) or "optional"
-                
+            for attr in own_attributes:
+                if 'name' not in attr.attrib:
+                    continue
                 attributes.append({
-                    'name': attr_name,
-                    'type': attr_type,
-                    'use': attr_use
+                    'name': attr.get('name'),
+                    'type': attr.get('type', 'xs:string'),
+                    'use': attr.get('use', 'optional')
                 })
             
-            complex_types[type_name] = {
-                'elements': elements,
-                'attributes': attributes,
-                'definition': type_section
-            }
+            complex_types[type_elem.get('name')] = XsdType(elements, attributes)
+            # Sous-arbre traité : libéré au fil de la lecture
+            type_elem.clear()
         
         return complex_types
 
+def _new_results() -> Dict[str, List[str]]:
+    """Résultats de contrôle vides, par catégorie (ordre d'affichage du rapport)"""
+    return {
+        'conformity': [],
+        'missing_entities': [],
+        'extra_entities': [],
+        'attribute_mismatches': [],
+        'structure_issues': []
+    }
+
+def _check_one_entity(entity: str, sia_entity: Optional[SiaEntity], xsd_type: Optional[XsdType],
+                      entity_relations: Dict[str, Tuple[str, bool]],
+                      xsd_type_names: FrozenSet[str]) -> Dict[str, List[str]]:
+    """
+    Contrôle une entité (fonction pure : ne dépend que de ses arguments)
+    
+    Args:
+        entity: Nom de l'entité
+        sia_entity: Définition SIA de l'entité (None si absente de la spécification)
+        xsd_type: Type XSD de l'entité (None si absent du XSD)
+        entity_relations: Relations de l'entité {attribut: (entité cible, multiple)}
+        xsd_type_names: Noms de tous les types XSD (existence des entités cibles)
+    
+    Returns:
+        Résultats partiels de l'entité, par catégorie
+    """
+    results = _new_results()
+    
+    if sia_entity is not None and xsd_type is not None:
+        results['conformity'].append(f"✓ Entité {entity} présente dans XSD et spécification")
+        
+        # Vérifier les attributs/éléments
+        sia_attrs = sia_entity.attributes
+        xsd_elements = xsd_type.element_index
+        xsd_attributes = xsd_type.attribute_index
+        
+        # Attributs absents du XSD (ni élément ni attribut) : différence d'ensembles sur les
+        # clés, calculée en une fois ; le parcours garde l'ordre de la spécification
+        missing = sia_attrs.keys() - xsd_elements.keys() - xsd_attributes.keys()
+        
+        # Vérifier les correspondances
+        for attr_name, attr_info in sia_attrs.items():
+            if attr_name in missing:
+                if not attr_info.is_optional:
+                    results['attribute_mismatches'].append(
+                        f"✗ {entity}.{attr_name}: Manquant dans XSD (requis dans SIA)"
+                    )
+                continue
+            
+            xsd_elem = xsd_elements.get(attr_name)
+            if xsd_elem is not None:
+                # Vérifier si l'élément obligatoire dans SIA est bien required dans XSD
+                if attr_info.is_required and xsd_elem['minOccurs'] == '0':
+                    results['attribute_mismatches'].append(
+                        f"⚠ {entity}.{attr_name}: Obligatoire dans SIA mais optionnel dans XSD"
+                    )
+                
+                # Vérifier les relations
+                if attr_name in entity_relations:
+                    _check_relation_consistency(entity, attr_name, entity_relations[attr_name],
+                                                xsd_elem, xsd_type, xsd_type_names, results)
+                
+                results['conformity'].append(f"✓ {entity}.{attr_name} correspond")
+            else:
+                xsd_attr = xsd_attributes[attr_name]
+                
+                # Vérifier les relations pour les attributs aussi
+                if attr_name in entity_relations:
+                    _check_relation_consistency(entity, attr_name, entity_relations[attr_name],
+                                                xsd_attr, xsd_type, xsd_type_names, results)
+                
+                results['conformity'].append(f"✓ {entity}.{attr_name} défini comme attribut XSD")
+        
+    elif sia_entity is not None:
+        results['missing_entities'].append(f"✗ Entité {entity} manquante dans XSD")
+    elif xsd_type is not None:
+        results['extra_entities'].append(f"? Entité {entity} dans XSD mais pas dans spéc de base")
+    
+    return results
+
+def _check_relation_consistency(entity_name: str, attr_name: str, relation: Tuple[str, bool],
+                                xsd_item: Dict, entity_type: XsdType, xsd_type_names: FrozenSet[str],
+                                results: Dict[str, List[str]]):
+    """
+    Vérifie la cohérence des relations SIA vs XSD
+    
+    Args:
+        entity_name: Entité contrôlée
+        attr_name: Attribut SIA contrôlé (domaine de type relation)
+        relation: Tuple (entité cible, relation multiple) relevé par _find_relations
+        xsd_item: Élément ou attribut XSD correspondant
+        entity_type: Type XSD de l'entité contrôlée
+        xsd_type_names: Noms de tous les types XSD (existence des entités cibles)
+        results: Résultats complétés par ce contrôle
+    """
+    
+    target_entity, is_multiple = relation
+    
+    # Pour un élément XSD
+    if 'type' in xsd_item:
+        xsd_type = xsd_item['type']
+        
+        # Vérifier que le type XSD correspond à l'entité cible
+        if xsd_type == f"{target_entity}RefType":
+            results['conformity'].append(
+                f"✓ {entity_name}.{attr_name}: Relation vers {target_entity} correctement typée"
+            )
+        elif xsd_type == "xs:string" and xsd_item.get('name') in ['pk', 'lk']:
+            # Référence par clé primaire ou logique - acceptable
+            results['conformity'].append(
+                f"✓ {entity_name}.{attr_name}: Référence {target_entity} par clé"
+            )
+        else:
+            # Vérifier si c'est un attribut pk/lk qui référence
+            if 'pk' in entity_type.attribute_name_set:
+                results['conformity'].append(
+                    f"✓ {entity_name}.{attr_name}: Relation {target_entity} avec attributs pk/lk"
+                )
+            else:
+                results['attribute_mismatches'].append(
+                    f"⚠ {entity_name}.{attr_name}: Relation vers {target_entity} mal typée "
+                    f"(XSD: {xsd_type}, attendu: {target_entity}RefType ou pk/lk)"
+                )
+    
+    # Vérifier que l'entité cible existe
+    if target_entity not in xsd_type_names:
+        results['structure_issues'].append(
+            f"❌ {entity_name}.{attr_name}: Relation vers {target_entity} mais entité inexistante dans XSD"
+        )
+    
+    # Relations multiples (ex: "relation(Service)*")
+    if is_multiple:
+        if 'maxOccurs' in xsd_item and xsd_item['maxOccurs'] == 'unbounded':
+            results['conformity'].append(
+                f"✓ {entity_name}.{attr_name}: Relation multiple vers {target_entity} correctement définie"
+            )
+        else:
+            results['attribute_mismatches'].append(
+                f"⚠ {entity_name}.{attr_name}: Relation multiple vers {target_entity} "
+                f"mais maxOccurs≠unbounded dans XSD"
+            )
+
+def _find_relations(sia_entities: Dict[str, SiaEntity]) -> Dict[str, Dict[str, Tuple[str, bool]]]:
+    """
+    Relève les relations déclarées dans la spécification (une correspondance par domaine)
+    
+    Args:
+        sia_entities: Entités SIA
+    
+    Returns:
+        Par entité ayant des relations : {attribut: (entité cible, relation multiple)}
+    """
+    relations = {}
+    for entity_name, entity_info in sia_entities.items():
+        for attr_name, attr_info in entity_info.attributes.items():
+            domain = attr_info.domain
+            if not domain.startswith(_RELATION_PREFIX):
+                continue
+            relation_match = _RELATION_RE.match(domain)
+            if relation_match:
+                relations.setdefault(entity_name, {})[attr_name] = (relation_match.group(1),
+                                                                   bool(relation_match.group(2)))
+    return relations
+
+def _module_fingerprint() -> str:
+    """Empreinte du code de ce module (classes sérialisées dans le cache)"""
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _cached_definitions_valid(sia_entities, xsd_types) -> bool:
+    """
+    Vérifie les objets relus du cache : le dépicklage ne passe pas par __post_init__,
+    les index de XsdType doivent donc y être présents
+    
+    Args:
+        sia_entities: Entités SIA relues
+        xsd_types: Types XSD relus
+    
+    Returns:
+        True si les définitions sont utilisables telles quelles
+    """
+    if not isinstance(sia_entities, dict) or not isinstance(xsd_types, dict):
+        return False
+    if not all(isinstance(entity, SiaEntity) and isinstance(getattr(entity, 'attributes', None), dict)
+               for entity in sia_entities.values()):
+        return False
+    return all(isinstance(xsd_type, XsdType) and all(hasattr(xsd_type, slot) for slot in XsdType.__slots__)
+               for xsd_type in xsd_types.values())
+
 class SiaCoherenceChecker:
     """Vérificateur de cohérence entre XSD et spécification SIA"""
     
     def __init__(self, spec_file: str, xsd_file: str):
-        self.spec_parser = SiaSpecificationParser(spec_file)
-        self.xsd_parser = XsdParser(xsd_file)
-        
-        self.sia_entities = self.spec_parser.parse_entities()
-        self.xsd_types = self.xsd_parser.extract_complex_types()
-        
+        self.sia_entities, self.xsd_types = self._load_or_build(spec_file, xsd_file)
+        self._relations = None
+    
+    def _load_or_build(self, spec_file: str, xsd_file: str) -> Tuple[Dict[str, SiaEntity], Dict[str, XsdType]]:
+        """
+        Charge les définitions depuis le cache disque, ou les analyse et met le cache à jour
+        
+        Le cache n'est valable que pour les mêmes fichiers aux mêmes dates de modification.
+        
+        Args:
+            spec_file: Fichier de spécification SIA (markdown)
+            xsd_file: Fichier XSD
+        
+        Returns:
+            Tuple (entités SIA, types XSD)
+        """
+        cache_key = (CACHE_FORMAT_VERSION, _module_fingerprint(),
+                     os.path.abspath(spec_file), os.path.getmtime(spec_file),
+                     os.path.abspath(xsd_file), os.path.getmtime(xsd_file))
+        
+        try:
+            with open(CACHE_FILE, 'rb') as f:
+                cached_key, sia_entities, xsd_types = pickle.load(f)
+            if cached_key == cache_key and _cached_definitions_valid(sia_entities, xsd_types):
+                return sia_entities, xsd_types
+        except (OSError, pickle.PickleError, EOFError, AttributeError, ValueError, TypeError):
+            # Cache absent, illisible ou d'une version antérieure : nouvelle analyse
+            pass
+        
+        sia_entities = SiaSpecificationParser(spec_file).parse_entities()
+        xsd_types = XsdParser(xsd_file).extract_complex_types()
+        
+        try:
+            os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+            with open(CACHE_FILE, 'wb') as f:
+                pickle.dump((cache_key, sia_entities, xsd_types), f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            print(f"⚠ Cache d'analyse non enregistré: {e}")
+        
+        return sia_entities, xsd_types
+    
+    def _relations_index(self) -> Dict[str, Dict[str, Tuple[str, bool]]]:
+        """
+        Relations déclarées dans la spécification, relevées au premier appel
+        
+        Returns:
+            Par entité (ordre du document) : {attribut: (entité cible, relation multiple)}
+        """
+        if self._relations is None:
+            self._relations = _find_relations(self.sia_entities)
+        return self._relations
+    
     def check_coherence(self) -> Dict[str, List[str]]:
         """Vérifie la cohérence entre XSD et spécification"""
         
-        results = {
-            'conformity': [],
-            'missing_entities': [],
-            'extra_entities': [],
-            'attribute_mismatches': [],
-            'structure_issues': []
-        }
+        results = _new_results()
         
         # Entités principales à vérifier
         core_entities = ['Espace', 'Partie', 'Volume', 'Service', 'Frequence', 'Ad', 'Territoire']
         
+        # Contrôles indépendants d'une entité à l'autre, résultats fusionnés dans l'ordre
+        xsd_type_names = frozenset(self.xsd_types)
+        relations = self._relations_index()
         for entity in core_entities:
-            if entity in self.sia_entities and entity in self.xsd_types:
-                results['conformity'].append(f"✓ Entité {entity} présente dans XSD et spécification")
-                
-                # Vérifier les attributs/éléments
-                sia_attrs = self.sia_entities[entity]['attributes']
-                xsd_elements = {elem['name']: elem for elem in self.xsd_types[entity]['elements']}
-                xsd_attributes = {attr['name']: attr for attr in self.xsd_types[entity]['attributes']}
-                
-                # Vérifier les correspondances
-                for attr_name, attr_info in sia_attrs.items():
-                    if attr_name in xsd_elements:
-                        xsd_elem = xsd_elements[attr_name]
-                        
-                        # Vérifier si l'élément obligatoire dans SIA est bien required dans XSD
-                        if attr_info['is_required'] and xsd_elem['minOccurs'] == '0':
-                            results['attribute_mismatches'].append(
-                                f"⚠ {entity}.{attr_name}: Obligatoire dans SIA mais optionnel dans XSD"
-                            )
-                        
-                        # Vérifier les relations
-                        self._check_relation_consistency(entity, attr_name, attr_info, xsd_elem, results)
-                        
-                        results['conformity'].append(f"✓ {entity}.{attr_name} correspond")
-                    elif attr_name in xsd_attributes:
-                        xsd_attr = xsd_attributes[attr_name]
-                        
-                        # Vérifier les relations pour les attributs aussi
-                        self._check_relation_consistency(entity, attr_name, attr_info, xsd_attr, results)
-                        
-                        results['conformity'].append(f"✓ {entity}.{attr_name} défini comme attribut XSD")
-                    else:
-                        if not attr_info['is_optional']:
-                            results['attribute_mismatches'].append(
-                                f"✗ {entity}.{attr_name}: Manquant dans XSD (requis dans SIA)"
-                            )
-                
-            elif entity in self.sia_entities:
-                results['missing_entities'].append(f"✗ Entité {entity} manquante dans XSD")
-            elif entity in self.xsd_types:
-                results['extra_entities'].append(f"? Entité {entity} dans XSD mais pas dans spéc de base")
+            partial = _check_one_entity(entity, self.sia_entities.get(entity),
+                                        self.xsd_types.get(entity),
+                                        relations.get(entity, {}), xsd_type_names)
+            for key, items in partial.items():
+                results[key].extend(items)
         
         return results
     
-    def _check_relation_consistency(self, entity_name: str, attr_name: str, attr_info: Dict, 
-                                  xsd_item: Dict, results: Dict[str, List[str]]):
-        """Vérifie la cohérence des relations SIA vs XSD"""
-        
-        domain = attr_info['domain'].strip()
-        
-        # Détecter si c'est une relation
-        relation_match = re.match(r'relation\((\w+)\)', domain)
-        if relation_match:
-            target_entity = relation_match.group(1)
-            
-            # Pour un élément XSD
-            if 'type' in xsd_item:
-                xsd_type = xsd_item['type']
-                
-                # Vérifier que le type XSD correspond à l'entité cible
-                if xsd_type == f"{target_entity}RefType":
-                    results['conformity'].append(
-                        f"✓ {entity_name}.{attr_name}: Relation vers {target_entity} correctement typée"
-                    )
-                elif xsd_type == "xs:string" and xsd_item.get('name') in ['pk', 'lk']:
-                    # Référence par clé primaire ou logique - acceptable
-                    results['conformity'].append(
-                        f"✓ {entity_name}.{attr_name}: Référence {target_entity} par clé"
-                    )
-                else:
-                    # Vérifier si c'est un attribut pk/lk qui référence
-                    if any(attr.get('name') == 'pk' for attr in self.xsd_types.get(entity_name, {}).get('attributes', [])):
-                        results['conformity'].append(
-                            f"✓ {entity_name}.{attr_name}: Relation {target_entity} avec attributs pk/lk"
-                        )
-                    else:
-                        results['attribute_mismatches'].append(
-                            f"⚠ {entity_name}.{attr_name}: Relation vers {target_entity} mal typée "
-                            f"(XSD: {xsd_type}, attendu: {target_entity}RefType ou pk/lk)"
-                        )
-            
-            # Vérifier que l'entité cible existe
-            if target_entity not in self.xsd_types:
-                results['structure_issues'].append(
-                    f"❌ {entity_name}.{attr_name}: Relation vers {target_entity} mais entité inexistante dans XSD"
-                )
-        
-        # Détecter les relations multiples (ex: "relation(Service)*")
-        multi_relation_match = re.match(r'relation\((\w+)\)\*', domain)
-        if multi_relation_match:
-            target_entity = multi_relation_match.group(1)
-            
-            if 'maxOccurs' in xsd_item and xsd_item['maxOccurs'] == 'unbounded':
-                results['conformity'].append(
-                    f"✓ {entity_name}.{attr_name}: Relation multiple vers {target_entity} correctement définie"
-                )
-            else:
-                results['attribute_mismatches'].append(
-                    f"⚠ {entity_name}.{attr_name}: Relation multiple vers {target_entity} "
-                    f"mais maxOccurs≠unbounded dans XSD"
-                )
-    
     def print_report(self):
         """Affiche le rapport de cohérence"""
         
         results = self.check_coherence()
         
-        print("="*80)
-        print("RAPPORT DE COHÉRENCE XSD vs SPÉCIFICATION SIA v6.0")
-        print("="*80)
+        # Lignes du rapport accumulées puis écrites en une fois
+        out = []
+        out.append("="*80)
+        out.append("RAPPORT DE COHÉRENCE XSD vs SPÉCIFICATION SIA v6.0")
+        out.append("="*80)
         
-        print(f"\n📋 ENTITÉS SIA ANALYSÉES: {len(self.sia_entities)}")
+        out.append(f"\n📋 ENTITÉS SIA ANALYSÉES: {len(self.sia_entities)}")
         for name, info in self.sia_entities.items():
-            print(f"  - {name}: {info['description']} ({len(info['attributes'])} attributs)")
+            out.append(f"  - {name}: {info.description} ({len(info.attributes)} attributs)")
         
-        print(f"\n🔧 TYPES XSD DÉFINIS: {len(self.xsd_types)}")
+        out.append(f"\n🔧 TYPES XSD DÉFINIS: {len(self.xsd_types)}")
         for name, info in self.xsd_types.items():
-            elem_count = len(info['elements'])
-            attr_count = len(info['attributes'])
-            print(f"  - {name}: {elem_count} éléments, {attr_count} attributs")
+            elem_count = len(info.elements)
+            attr_count = len(info.attributes)
+            out.append(f"  - {name}: {elem_count} éléments, {attr_count} attributs")
         
-        print(f"\n✅ CONFORMITÉS ({len(results['conformity'])})")
+        out.append(f"\n✅ CONFORMITÉS ({len(results['conformity'])})")
         for item in results['conformity']:
-            print(f"  {item}")
+            out.append(f"  {item}")
         
         if results['missing_entities']:
-            print(f"\n❌ ENTITÉS MANQUANTES ({len(results['missing_entities'])}):")
+            out.append(f"\n❌ ENTITÉS MANQUANTES ({len(results['missing_entities'])}):")
             for item in results['missing_entities']:
-                print(f"  {item}")
+                out.append(f"  {item}")
         
         if results['extra_entities']:
-            print(f"\n➕ ENTITÉS SUPPLÉMENTAIRES ({len(results['extra_entities'])}):")
+            out.append(f"\n➕ ENTITÉS SUPPLÉMENTAIRES ({len(results['extra_entities'])}):")
             for item in results['extra_entities']:
-                print(f"  {item}")
+                out.append(f"  {item}")
         
         if results['attribute_mismatches']:
-            print(f"\n⚠️  DIVERGENCES ATTRIBUTS ({len(results['attribute_mismatches'])}):")
+            out.append(f"\n⚠️  DIVERGENCES ATTRIBUTS ({len(results['attribute_mismatches'])}):")
             for item in results['attribute_mismatches']:
-                print(f"  {item}")
+                out.append(f"  {item}")
         
         if results['structure_issues']:
-            print(f"\n🔗 PROBLÈMES STRUCTURELS ({len(results['structure_issues'])}):")
+            out.append(f"\n🔗 PROBLÈMES STRUCTURELS ({len(results['structure_issues'])}):")
             for item in results['structure_issues']:
-                print(f"  {item}")
+                out.append(f"  {item}")
         
         # Analyse spécifique des relations
-        self._print_relations_analysis()
+        self._print_relations_analysis(out)
         
         # Analyse détaillée des entités principales
-        print(f"\n📊 ANALYSE DÉTAILLÉE DES ENTITÉS PRINCIPALES")
-        print("-" * 60)
+        out.append(f"\n📊 ANALYSE DÉTAILLÉE DES ENTITÉS PRINCIPALES")
+        out.append("-" * 60)
         
         core_entities = ['Espace', 'Partie', 'Volume', 'Service', 'Frequence']
         
         for entity in core_entities:
             if entity in self.sia_entities:
-                print(f"\n🔍 {entity.upper()}")
+                out.append(f"\n🔍 {entity.upper()}")
                 sia_entity = self.sia_entities[entity]
-                print(f"   Description SIA: {sia_entity['description']}")
+                out.append(f"   Description SIA: {sia_entity.description}")
                 
                 if entity in self.xsd_types:
                     xsd_type = self.xsd_types[entity]
-                    print(f"   XSD: {len(xsd_type['elements'])} éléments, {len(xsd_type['attributes'])} attributs")
+                    out.append(f"   XSD: {len(xsd_type.elements)} éléments, {len(xsd_type.attributes)} attributs")
                     
                     # Détail des attributs obligatoires
-                    required_attrs = [name for name, info in sia_entity['attributes'].items() 
-                                    if info['is_required'] or info['is_key']]
+                    required_attrs = [name for name, info in sia_entity.attributes.items() 
+                                    if info.flags & (FLAG_REQUIRED | FLAG_KEY)]
                     if required_attrs:
-                        print(f"   Attributs SIA obligatoires: {', '.join(required_attrs)}")
+                        out.append(f"   Attributs SIA obligatoires: {', '.join(required_attrs)}")
                 else:
-                    print(f"   ❌ Pas de définition XSD correspondante")
+                    out.append(f"   ❌ Pas de définition XSD correspondante")
         
-        print(f"\n" + "="*80)
+        out.append(f"\n" + "="*80)
+        sys.stdout.write('\n'.join(out) + '\n')
     
-    def _print_relations_analysis(self):
-        """Analyse détaillée des relations dans la spécification SIA"""
+    def _print_relations_analysis(self, out: List[str]):
+        """
+        Analyse détaillée des relations dans la spécification SIA
         
-        print(f"\n🔗 ANALYSE DES RELATIONS SIA")
-        print("-" * 60)
+        Args:
+            out: Lignes du rapport en cours, complétées par cette analyse
+        """
         
-        relations_found = {}
+        out.append(f"\n🔗 ANALYSE DES RELATIONS SIA")
+        out.append("-" * 60)
         
-        # Parcourir toutes les entités pour trouver les relations
-        for entity_name, entity_info in self.sia_entities.items():
-            for attr_name, attr_info in entity_info['attributes'].items():
-                domain = attr_info['domain'].strip()
-                
-                # Relations simples
-                relation_match = re.match(r'relation\((\w+)\)', domain)
-                if relation_match:
-                    target_entity = relation_match.group(1)
-                    if entity_name not in relations_found:
-                        relations_found[entity_name] = []
-                    relations_found[entity_name].append({
-                        'attribute': attr_name,
-                        'target': target_entity,
-                        'type': 'simple',
-                        'required': attr_info['is_required'] or attr_info['is_key']
-                    })
-                
-                # Relations multiples
-                multi_relation_match = re.match(r'relation\((\w+)\)\*', domain)
-                if multi_relation_match:
-                    target_entity = multi_relation_match.group(1)
-                    if entity_name not in relations_found:
-                        relations_found[entity_name] = []
+        # Relations relevées une seule fois (index partagé avec check_coherence)
+        relations_found = {}
+        for entity_name, entity_relations in self._relations_index().items():
+            attributes = self.sia_entities[entity_name].attributes
+            relations_found[entity_name] = []
+            for attr_name, (target_entity, is_multiple) in entity_relations.items():
+                required = bool(attributes[attr_name].flags & (FLAG_REQUIRED | FLAG_KEY))
+                # Une relation multiple est aussi listée comme relation simple
+                relations_found[entity_name].append({
+                    'attribute': attr_name,
+                    'target': target_entity,
+                    'type': 'simple',
+                    'required': required
+                })
+                if is_multiple:
                     relations_found[entity_name].append({
                         'attribute': attr_name,
                         'target': target_entity,
                         'type': 'multiple',
-                        'required': attr_info['is_required'] or attr_info['is_key']
+                        'required': required
                     })
         
         if relations_found:
-            print(f"\n📊 Relations détectées dans la spécification SIA :")
+            out.append(f"\n📊 Relations détectées dans la spécification SIA :")
             for entity, relations in relations_found.items():
-                print(f"\n   {entity.upper()} :")
+                out.append(f"\n   {entity.upper()} :")
+                # Index du type XSD de l'entité (construits au parsing), une fois par entité
+                xsd_type = self.xsd_types.get(entity)
                 for rel in relations:
                     req_marker = " (obligatoire)" if rel['required'] else " (optionnel)"
                     type_marker = "→*" if rel['type'] == 'multiple' else "→"
-                    print(f"     {rel['attribute']} {type_marker} {rel['target']}{req_marker}")
+                    out.append(f"     {rel['attribute']} {type_marker} {rel['target']}{req_marker}")
                     
                     # Vérifier la cohérence XSD
-                    if entity in self.xsd_types:
-                        xsd_elements = {elem['name']: elem for elem in self.xsd_types[entity]['elements']}
-                        xsd_attributes = {attr['name']: attr for attr in self.xsd_types[entity]['attributes']}
-                        
-                        if rel['attribute'] in xsd_elements:
-                            xsd_elem = xsd_elements[rel['attribute']]
+                    if xsd_type is not None:
+                        xsd_elem = xsd_type.element_index.get(rel['attribute'])
+                        if xsd_elem is not None:
                             if rel['type'] == 'multiple' and xsd_elem.get('maxOccurs') != 'unbounded':
-                                print(f"       ⚠ XSD: maxOccurs devrait être 'unbounded'")
+                                out.append(f"       ⚠ XSD: maxOccurs devrait être 'unbounded'")
                             elif xsd_elem.get('type') == f"{rel['target']}RefType":
-                                print(f"       ✓ XSD: Correctement typé comme {rel['target']}RefType")
-                            elif 'pk' in [a['name'] for a in self.xsd_types[entity]['attributes']]:
-                                print(f"       ✓ XSD: Référence par pk/lk")
+                                out.append(f"       ✓ XSD: Correctement typé comme {rel['target']}RefType")
+                            elif 'pk' in xsd_type.attribute_name_set:
+                                out.append(f"       ✓ XSD: Référence par pk/lk")
                             else:
-                                print(f"       ? XSD: Type {xsd_elem.get('type', 'inconnu')}")
+                                out.append(f"       ? XSD: Type {xsd_elem.get('type', 'inconnu')}")
         else:
-            print("   Aucune relation détectée dans la spécification")
+            out.append("   Aucune relation détectée dans la spécification")
 
 def main():
     """Point d'entrée principal"""
@@ -45,6 +45,7 @@ class WorkflowEspace:
         self.processed_spaces = []
         self.selected_spaces = []
         self.launch_google_earth = False
+        self._extractor = None  # Extracteur XML chargé, partagé entre les espaces
         
     def search_spaces(self, keyword: str) -> List[SearchResult]:
         """
@@ -278,12 +279,15 @@ class WorkflowEspace:
             print(f"  📤 Extraction depuis {self.xml_source}...")
             
             try:
-                extractor = XsdBasedEspaceExtractor(self.xml_source)
-                
-                # Charger le fichier XML
-                if not extractor.load_xml():
-                    print(f"    ✗ Erreur lors du chargement du fichier XML: {self.xml_source}")
-                    return False
+                # XML source chargé et indexé une seule fois pour tous les espaces
+                if self._extractor is None:
+                    extractor = XsdBasedEspaceExtractor(self.xml_source)
+                    if not extractor.load_xml():
+                        print(f"    ✗ Erreur lors du chargement du fichier XML: {self.xml_source}")
+                        return False
+                    self._extractor = extractor
+                extractor = self._extractor
+                extractor.reset_extracted()
                 
                 # Générer nom de fichier de sortie
                 output_filename = space.lk.replace('[', '').replace(']', '').replace(' ', '_')